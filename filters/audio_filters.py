@@ -1,20 +1,288 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import numpy as np
 import librosa
 from scipy import signal
+import scipy.fft
+
+# 선택 의존성: numpy-rms (C/AVX/NEON RMS 커널). 없으면 NumPy 경로 사용
+try:
+    import numpy_rms
+except ImportError:
+    numpy_rms = None
+
+# 선택 의존성: pyFFTW (FFTW 플래닝 FFT 백엔드). 크기 1024 변환이 반복되므로 플랜 재사용 효과가 큼
+try:
+    import pyfftw
+    pyfftw.interfaces.cache.enable()
+except ImportError:
+    pyfftw = None
+
+# 선택 의존성: numba (librosa가 이미 요구하는 패키지). RMS/run-length 커널 JIT용
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def _rms_windows_numba(x, window_size, hop):
+        n = (x.shape[0] - window_size) // hop + 1
+        out = np.empty(n, dtype=np.float32)
+        for k in range(n):
+            acc = 0.0
+            base = k * hop
+            for j in range(window_size):
+                v = x[base + j]
+                acc += v * v
+            out[k] = np.sqrt(acc / window_size)
+        return out
+
+    @njit(cache=True, boundscheck=False)
+    def _longest_run_numba(mask):
+        best = 0
+        cur = 0
+        for i in range(mask.shape[0]):
+            if mask[i]:
+                cur += 1
+                if cur > best:
+                    best = cur
+            else:
+                cur = 0
+        return best
+
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def _band_energy_sums_numba(mag, low_count, high_start):
+        """한 번의 스윕으로 프레임별 total/low/high 밴드 합을 동시에 누적"""
+        n_freq, n_frames = mag.shape
+        out = np.zeros((3, n_frames), dtype=np.float32)
+        for t in range(n_frames):
+            total = 0.0
+            low = 0.0
+            high = 0.0
+            for i in range(n_freq):
+                v = mag[i, t]
+                total += v
+                if i < low_count:
+                    low += v
+                if i >= high_start:
+                    high += v
+            out[0, t] = total
+            out[1, t] = low
+            out[2, t] = high
+        return out
+
+    # 임포트 시 1회 워밍업으로 JIT 컴파일 비용을 선지불 (cache=True로 재사용)
+    _rms_windows_numba(np.zeros(8, dtype=np.float32), 4, 2)
+    _longest_run_numba(np.zeros(4, dtype=np.bool_))
+    _band_energy_sums_numba(np.zeros((4, 2), dtype=np.float32), 1, 3)
+else:
+    _rms_windows_numba = None
+    _longest_run_numba = None
+    _band_energy_sums_numba = None
+
+
+@lru_cache(maxsize=4)
+def _get_stft(sample_rate):
+    """샘플레이트별 ShortTimeFFT 인스턴스 캐시 (rfft 단측 스펙트럼, hann 1024/hop 512)"""
+    win = signal.windows.hann(1024, sym=False)
+    return signal.ShortTimeFFT(win=win, hop=512, fs=sample_rate,
+                               fft_mode='onesided', scale_to='magnitude')
+
+
+@lru_cache(maxsize=8)
+def _high_freq_mask(sample_rate, freq_threshold):
+    """(샘플레이트, 임계 주파수)별 고주파 빈 마스크 캐시"""
+    return _get_stft(sample_rate).f >= freq_threshold
+
+
+@lru_cache(maxsize=8)
+def _extreme_freq_masks(sample_rate, low_threshold, high_threshold):
+    """(샘플레이트, 저/고 임계)별 극단 주파수 빈 마스크 캐시"""
+    f = _get_stft(sample_rate).f
+    return f <= low_threshold, f >= high_threshold
 
 
 class AudioQualityFilters:
     """음악 품질 검사 필터들 - 세분화된 버전"""
 
+    # 검사들이 보는 최고 주파수(15kHz)를 보존하는 최소 샘플레이트
+    CHECK_MAX_SAMPLE_RATE = 32000
+
+    # 같은 오디오가 run_all_checks와 run_musical_checks를 연달아 지날 때
+    # 리샘플/STFT를 다시 하지 않도록 하는 소형 캐시. 배치 파이프라인의
+    # 워커 스레드들이 동시에 만지므로 조회/저장/밀어내기는 락으로 직렬화
+    _spectrum_cache = OrderedDict()
+    _SPECTRUM_CACHE_SIZE = 4
+    _spectrum_cache_limit = _SPECTRUM_CACHE_SIZE
+    _spectrum_lock = threading.Lock()
+
+    @classmethod
+    def _prepare_checks(cls, audio_data, sample_rate):
+        """리샘플 + 공유 스펙트럼 준비 (동일 버퍼 재호출 시 캐시 재사용)
+
+        키는 (id, 길이, 샘플레이트) — 같은 ndarray 객체가 파이프라인 안에서
+        연속으로 검사될 때만 적중하면 되는 수준의 캐시다. id()는 객체가
+        해제되면 재사용되므로, 키의 원본 객체를 값에 강참조로 같이 보관해
+        항목이 살아있는 동안 id가 다른 배열에 넘어가지 않게 한다.
+        """
+        key = (id(audio_data), len(audio_data), sample_rate)
+        # get과 move_to_end 사이에 다른 워커의 밀어내기가 끼어들 수 있으므로
+        # 둘을 한 락 구간에서 처리 (계산은 락 밖에서)
+        with cls._spectrum_lock:
+            hit = cls._spectrum_cache.get(key)
+            if hit is not None:
+                cls._spectrum_cache.move_to_end(key)
+        if hit is not None:
+            return hit[1], hit[2], hit[3]
+
+        prepared, sr = cls._resample_for_checks(audio_data, sample_rate)
+        spectrum = cls._compute_shared_spectrum(prepared, sr)
+        cls._store_spectrum(key, (audio_data, prepared, sr, spectrum))
+        return prepared, sr, spectrum
+
+    @classmethod
+    def _store_spectrum(cls, key, value, limit=None):
+        """스펙트럼 캐시에 넣고 오래된 항목부터 밀어냄 (락으로 직렬화)
+
+        프라이밍이 배치 크기로 키운 상한은 유지한다 - 배치 도중 기본
+        상한으로 되돌아가면 방금 프라이밍한 항목들이 바로 밀려난다.
+        """
+        with cls._spectrum_lock:
+            if limit is not None and limit > cls._spectrum_cache_limit:
+                cls._spectrum_cache_limit = limit
+            cls._spectrum_cache[key] = value
+            while len(cls._spectrum_cache) > cls._spectrum_cache_limit:
+                cls._spectrum_cache.popitem(last=False)
+
+    @classmethod
+    def prime_spectrum_cache(cls, batch):
+        """같은 길이 오디오 묶음의 공유 스펙트럼을 배치 STFT 한 번으로 선계산
+
+        배치 생성 결과는 길이/샘플레이트가 모두 같으므로 (B, T)로 쌓아
+        ShortTimeFFT를 한 번만 호출한다 - FFT 플랜 준비와 커널 호출이
+        곡당 1회에서 배치당 1회로 준다. 결과는 버퍼별로 캐시에 넣어 두므로
+        이후 run_all_checks / run_musical_checks는 그대로 캐시에 적중한다.
+        """
+        pending = []
+        for audio_data, sample_rate in batch:
+            # 빈 버퍼는 길이 검사에서 스펙트럼을 보기 전에 탈락하므로
+            # 프라이밍할 것이 없다 (STFT에 넣으면 예외만 난다)
+            if len(audio_data) == 0:
+                continue
+            key = (id(audio_data), len(audio_data), sample_rate)
+            with cls._spectrum_lock:
+                if key in cls._spectrum_cache:
+                    continue
+            prepared, sr = cls._resample_for_checks(audio_data, sample_rate)
+            pending.append((key, audio_data, prepared, sr))
+
+        # 길이/샘플레이트가 같은 것끼리만 쌓을 수 있다
+        groups = {}
+        for key, source, prepared, sr in pending:
+            groups.setdefault((len(prepared), sr), []).append(
+                (key, source, prepared, sr))
+
+        limit = max(cls._SPECTRUM_CACHE_SIZE, len(batch))
+        for (n, sr), items in groups.items():
+            if len(items) == 1:
+                for key, source, prepared, item_sr in items:
+                    cls._store_spectrum(
+                        key,
+                        (source, prepared, item_sr,
+                         cls._compute_shared_spectrum(prepared, item_sr)),
+                        limit=limit)
+                continue
+
+            SFT = _get_stft(sr)
+            stacked = np.stack([prepared for _, _, prepared, _ in items])
+            if pyfftw is not None:
+                with scipy.fft.set_backend(pyfftw.interfaces.scipy_fft):
+                    S = np.abs(SFT.stft(stacked, axis=-1))
+            else:
+                S = np.abs(SFT.stft(stacked, axis=-1))
+            t = SFT.t(n)
+            frame_energy = S.mean(axis=-2)
+            for i, (key, source, prepared, _) in enumerate(items):
+                # centroid는 배치된 스펙트럼에서 곡별로 유도 (STFT 대비 저렴)
+                centroid = librosa.feature.spectral_centroid(S=S[i], sr=sr)[0]
+                spectrum = {'f': SFT.f, 't': t, 'S': S[i],
+                            'centroid': centroid, 'frame_energy': frame_energy[i]}
+                cls._store_spectrum(key, (source, prepared, sr, spectrum),
+                                    limit=limit)
+
     @staticmethod
-    def check_duration(audio_data, sample_rate, active_threshold_db=-35, min_active_ratio=0.3):
+    def _resample_for_checks(audio_data, sample_rate):
+        """검사용 샘플레이트로 다운샘플 (32kHz 초과 입력만 해당)
+
+        MusicGen 기본 출력(32kHz)은 그대로 통과하고, 44.1/48kHz 입력은
+        검사 임계값(최대 15kHz)을 보존하면서 FFT 비용을 줄이기 위해
+        32kHz로 낮춘다. 이후 모든 검사가 float32로 동작하도록
+        진입 시점에 한 번만 연속 float32 버퍼로 캐스팅한다.
+        """
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+        max_sr = AudioQualityFilters.CHECK_MAX_SAMPLE_RATE
+        if sample_rate > max_sr and len(audio_data) > 0:
+            audio_data = librosa.resample(audio_data, orig_sr=sample_rate,
+                                          target_sr=max_sr, res_type='polyphase')
+            sample_rate = max_sr
+        return audio_data, sample_rate
+
+    @staticmethod
+    def _longest_run(mask):
+        """불리언 배열에서 가장 긴 연속 True 구간의 길이(프레임 수) 반환"""
+        if _longest_run_numba is not None:
+            return int(_longest_run_numba(np.ascontiguousarray(mask, dtype=np.bool_)))
+        padded = np.r_[False, np.asarray(mask, dtype=bool), False]
+        edges = np.diff(padded.astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        return int((ends - starts).max()) if starts.size else 0
+
+    @staticmethod
+    def _compute_shared_spectrum(audio_data, sample_rate):
+        """주파수 검사들이 공유하는 STFT 스펙트럼을 한 번만 계산
+
+        각 check_*가 개별적으로 STFT를 다시 계산하지 않도록
+        f, t, 크기 스펙트럼(S)과 spectral centroid를 묶어서 반환한다.
+        """
+        SFT = _get_stft(sample_rate)
+        x = audio_data.astype(np.float32, copy=False)
+        # ShortTimeFFT는 윈도우 절반(512샘플)보다 짧은 입력에 ValueError를
+        # 던진다 - 예전 scipy.signal.stft처럼 0으로 채워 절대 예외가 새지
+        # 않게 한다 (검사들은 각자 try/except로 실패를 보고하는 계약)
+        min_len = (SFT.m_num + 1) // 2
+        if len(x) < min_len:
+            x = np.pad(x, (0, min_len - len(x)))
+        if pyfftw is not None:
+            # ShortTimeFFT는 scipy.fft를 쓰므로 백엔드 교체만으로 FFTW 경로를 탄다
+            with scipy.fft.set_backend(pyfftw.interfaces.scipy_fft):
+                S = np.abs(SFT.stft(x))
+        else:
+            S = np.abs(SFT.stft(x))
+        f = SFT.f
+        t = SFT.t(len(x))
+        centroid = librosa.feature.spectral_centroid(S=S, sr=sample_rate)[0]
+        # 프레임별 전체 에너지(빈 평균)는 여러 검사가 분모로 쓰므로 한 번만 계산
+        frame_energy = np.mean(S, axis=0)
+        return {'f': f, 't': t, 'S': S, 'centroid': centroid, 'frame_energy': frame_energy}
+
+    @staticmethod
+    def check_duration(audio_data, sample_rate, active_threshold_db=-35, min_active_ratio=0.3, spectrum=None):
         """전체 오디오 중 소리가 실제로 나는 비율 검사"""
         try:
             if len(audio_data) == 0:
                 return {'passed': False, 'score': 0.0, 'reason': 'Audio data is empty'}
 
-            # RMS 계산 (프레임 단위, 2048 샘플, hop_length=512)
-            rms = librosa.feature.rms(y=audio_data, frame_length=2048, hop_length=512)[0]
+            # RMS 계산 - 공유 스펙트럼이 있으면 스펙트로그램에서 바로 유도
+            # (dB는 ref=np.max 상대값이라 스케일 상수는 상쇄됨)
+            if spectrum is not None:
+                rms = librosa.feature.rms(S=spectrum['S'], frame_length=1024)[0]
+            else:
+                rms = librosa.feature.rms(y=audio_data, frame_length=2048, hop_length=512)[0]
             rms_db = librosa.amplitude_to_db(rms, ref=np.max)
 
             # 유효한 소리라고 판단되는 프레임 비율 계산
@@ -50,13 +318,22 @@ class AudioQualityFilters:
             if len(audio_data) < window_size:
                 return {'passed': True, 'score': 1.0, 'reason': 'Audio too short to check'}
             
-            rms_values = []
-            for i in range(0, len(audio_data) - window_size, window_size // 2):
-                window = audio_data[i:i + window_size]
-                rms = np.sqrt(np.mean(window**2))
-                rms_values.append(rms)
-            
-            rms_values = np.array(rms_values)
+            # 윈도우 단위 RMS를 한 번의 벡터 연산으로 계산 (Python 루프 제거)
+            if numpy_rms is not None:
+                # C/SIMD 커널은 비중첩 윈도우만 지원하므로 반 윈도우 RMS를
+                # 구한 뒤 인접 쌍을 제곱 평균으로 합친다 - 0.1초 윈도우
+                # 50% 중첩과 수치적으로 동일해 아래 경로들과 결과가 같다
+                buf = np.ascontiguousarray(audio_data, dtype=np.float32)
+                half_sq = np.square(numpy_rms.rms(buf, window_size // 2).ravel())
+                rms_values = np.sqrt((half_sq[:-1] + half_sq[1:]) / 2)
+            elif _rms_windows_numba is not None:
+                buf = np.ascontiguousarray(audio_data, dtype=np.float32)
+                rms_values = _rms_windows_numba(buf, window_size, window_size // 2)
+            else:
+                frames = np.lib.stride_tricks.sliding_window_view(
+                    audio_data.astype(np.float32, copy=False), window_size
+                )[::window_size // 2]
+                rms_values = np.sqrt(np.einsum('ij,ij->i', frames, frames) / window_size)
             
             # 끝부분 cutoff_threshold초 검사
             cutoff_samples = int(cutoff_threshold / 0.05)  # 0.05초마다 RMS 계산
@@ -92,21 +369,23 @@ class AudioQualityFilters:
             return {'passed': False, 'score': 0.0, 'reason': f'Volume check error: {e}'}
     
     @staticmethod  
-    def check_high_frequency_noise(audio_data, sample_rate, freq_threshold=8000, duration_threshold=3.0):
+    def check_high_frequency_noise(audio_data, sample_rate, freq_threshold=8000, duration_threshold=3.0, spectrum=None):
         """고주파 노이즈가 너무 오래 지속되는지 검사"""
         try:
-            # STFT 계산
-            f, t, Zxx = signal.stft(audio_data, sample_rate, nperseg=1024)
-            
-            # 고주파 영역 인덱스
-            high_freq_mask = f >= freq_threshold
-            
+            # 공유 스펙트럼이 없으면 직접 계산
+            if spectrum is None:
+                spectrum = AudioQualityFilters._compute_shared_spectrum(audio_data, sample_rate)
+            t, S = spectrum['t'], spectrum['S']
+
+            # 고주파 영역 인덱스 (샘플레이트별로 한 번만 계산)
+            high_freq_mask = _high_freq_mask(sample_rate, freq_threshold)
+
             if not np.any(high_freq_mask):
                 return {'passed': True, 'score': 1.0, 'reason': 'No high frequency content'}
-            
+
             # 각 시간 프레임별 고주파 에너지 비율
-            high_freq_energy = np.mean(np.abs(Zxx[high_freq_mask, :]), axis=0)
-            total_energy = np.mean(np.abs(Zxx), axis=0)
+            high_freq_energy = np.mean(S[high_freq_mask, :], axis=0)
+            total_energy = spectrum['frame_energy']
             
             # 0으로 나누기 방지
             energy_ratio = high_freq_energy / (total_energy + 1e-8)
@@ -114,18 +393,11 @@ class AudioQualityFilters:
             # 고주파 우세한 프레임들 (50% 이상)
             dominant_frames = energy_ratio > 0.5
             
-            # 연속된 고주파 우세 구간 찾기
+            # 연속된 고주파 우세 구간 찾기 (벡터화된 run-length)
             frame_duration = len(audio_data) / sample_rate / len(t)
-            max_continuous_duration = 0
-            current_duration = 0
-            
-            for is_dominant in dominant_frames:
-                if is_dominant:
-                    current_duration += frame_duration
-                    max_continuous_duration = max(max_continuous_duration, current_duration)
-                else:
-                    current_duration = 0
-            
+            max_continuous_duration = AudioQualityFilters._longest_run(dominant_frames) * frame_duration
+
+
             if max_continuous_duration > duration_threshold:
                 return {
                     'passed': False,
@@ -139,12 +411,14 @@ class AudioQualityFilters:
             return {'passed': False, 'score': 0.0, 'reason': f'Frequency check error: {e}'}
     
     @staticmethod
-    def check_frequency_drop(audio_data, sample_rate, drop_threshold=0.3, duration_threshold=2.0):
+    def check_frequency_drop(audio_data, sample_rate, drop_threshold=0.3, duration_threshold=2.0, spectrum=None):
         """고주파가 갑자기 급격히 떨어지는지 검사"""
         try:
             # Spectral Centroid 계산 (주파수 무게중심)
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sample_rate)[0]
-            
+            if spectrum is None:
+                spectrum = AudioQualityFilters._compute_shared_spectrum(audio_data, sample_rate)
+            spectral_centroids = spectrum['centroid']
+
             # 중앙값으로 정규화
             centroid_median = np.median(spectral_centroids)
             normalized_centroids = spectral_centroids / centroid_median
@@ -152,18 +426,11 @@ class AudioQualityFilters:
             # 급격한 드롭 찾기 (30% 이상 감소)
             drop_mask = normalized_centroids < (1 - drop_threshold)
             
-            # 연속된 드롭 구간 찾기
+            # 연속된 드롭 구간 찾기 (벡터화된 run-length)
             frame_duration = len(audio_data) / sample_rate / len(spectral_centroids)
-            max_drop_duration = 0
-            current_drop_duration = 0
-            
-            for has_drop in drop_mask:
-                if has_drop:
-                    current_drop_duration += frame_duration
-                    max_drop_duration = max(max_drop_duration, current_drop_duration)
-                else:
-                    current_drop_duration = 0
-            
+            max_drop_duration = AudioQualityFilters._longest_run(drop_mask) * frame_duration
+
+
             if max_drop_duration > duration_threshold:
                 return {
                     'passed': False,
@@ -177,60 +444,59 @@ class AudioQualityFilters:
             return {'passed': False, 'score': 0.0, 'reason': f'Frequency drop check error: {e}'}
     
     @staticmethod
-    def check_extreme_frequencies(audio_data, sample_rate, 
-                                low_freq_threshold=40, high_freq_threshold=15000, 
-                                duration_threshold=5.0, dominance_threshold=0.7):
+    def check_extreme_frequencies(audio_data, sample_rate,
+                                low_freq_threshold=40, high_freq_threshold=15000,
+                                duration_threshold=5.0, dominance_threshold=0.7,
+                                spectrum=None):
         """너무 높은 혹은 너무 낮은 주파수가 오래 지속되는지 검사 (더 관대하게)"""
         try:
-            # STFT 계산
-            f, t, Zxx = signal.stft(audio_data, sample_rate, nperseg=1024)
-            
-            # 극단적 주파수 영역 마스크 (더 관대한 범위)
-            too_low_mask = f <= low_freq_threshold  # 80Hz → 40Hz로 완화
-            too_high_mask = f >= high_freq_threshold
+            # 공유 스펙트럼이 없으면 직접 계산
+            if spectrum is None:
+                spectrum = AudioQualityFilters._compute_shared_spectrum(audio_data, sample_rate)
+            t, S = spectrum['t'], spectrum['S']
+
+            # 극단적 주파수 영역 마스크 (샘플레이트별로 한 번만 계산, 더 관대한 범위)
+            too_low_mask, too_high_mask = _extreme_freq_masks(
+                sample_rate, low_freq_threshold, high_freq_threshold)
             
             # 각 시간 프레임별 극단 주파수 에너지 비율
-            total_energy = np.mean(np.abs(Zxx), axis=0)
-            
-            # 너무 낮은 주파수 체크 (더 엄격한 임계값)
-            if np.any(too_low_mask):
-                low_freq_energy = np.mean(np.abs(Zxx[too_low_mask, :]), axis=0)
-                low_freq_ratio = low_freq_energy / (total_energy + 1e-8)
-                low_dominant_frames = low_freq_ratio > dominance_threshold  # 60% → 70%로 강화
+            # 저/고 마스크는 주파수 축의 접두/접미 구간이므로 카운트만으로 밴드를 자를 수 있음
+            low_count = int(np.count_nonzero(too_low_mask))
+            high_count = int(np.count_nonzero(too_high_mask))
+
+            if _band_energy_sums_numba is not None:
+                # 스펙트로그램을 한 번만 훑어 total/low/high를 동시에 누적
+                sums = _band_energy_sums_numba(S, low_count, S.shape[0] - high_count)
+                total_energy = sums[0] / S.shape[0]
+                low_freq_energy = sums[1] / low_count if low_count else None
+                high_freq_energy = sums[2] / high_count if high_count else None
+            else:
+                total_energy = spectrum['frame_energy']
+                low_freq_energy = S[:low_count].mean(axis=0) if low_count else None
+                high_freq_energy = S[-high_count:].mean(axis=0) if high_count else None
+
+            # 너무 낮은 주파수 체크 (더 엄격한 임계값: 60% → 70%로 강화)
+            if low_freq_energy is not None:
+                low_dominant_frames = low_freq_energy / (total_energy + 1e-8) > dominance_threshold
             else:
                 low_dominant_frames = np.zeros(len(t), dtype=bool)
-            
-            # 너무 높은 주파수 체크
-            if np.any(too_high_mask):
-                high_freq_energy = np.mean(np.abs(Zxx[too_high_mask, :]), axis=0)
-                high_freq_ratio = high_freq_energy / (total_energy + 1e-8)
-                high_dominant_frames = high_freq_ratio > 0.4  # 40% 이상
+
+            # 너무 높은 주파수 체크 (40% 이상)
+            if high_freq_energy is not None:
+                high_dominant_frames = high_freq_energy / (total_energy + 1e-8) > 0.4
             else:
                 high_dominant_frames = np.zeros(len(t), dtype=bool)
             
-            # 연속 구간 찾기
+            # 연속 구간 찾기 (벡터화된 run-length)
             frame_duration = len(audio_data) / sample_rate / len(t)
-            
+
             # 저주파 연속 구간
-            max_low_duration = 0
-            current_low_duration = 0
-            for is_low in low_dominant_frames:
-                if is_low:
-                    current_low_duration += frame_duration
-                    max_low_duration = max(max_low_duration, current_low_duration)
-                else:
-                    current_low_duration = 0
-            
+            max_low_duration = AudioQualityFilters._longest_run(low_dominant_frames) * frame_duration
+
             # 고주파 연속 구간
-            max_high_duration = 0
-            current_high_duration = 0
-            for is_high in high_dominant_frames:
-                if is_high:
-                    current_high_duration += frame_duration
-                    max_high_duration = max(max_high_duration, current_high_duration)
-                else:
-                    current_high_duration = 0
-            
+            max_high_duration = AudioQualityFilters._longest_run(high_dominant_frames) * frame_duration
+
+
             # 실패 조건 체크 (더 관대한 기준)
             if max_low_duration > duration_threshold:  # 3초 → 5초로 완화
                 return {
@@ -252,12 +518,14 @@ class AudioQualityFilters:
             return {'passed': False, 'score': 0.0, 'reason': f'Extreme frequency check error: {e}'}
     
     @staticmethod
-    def check_monotony(audio_data, sample_rate, variance_threshold=0.1):
+    def check_monotony(audio_data, sample_rate, variance_threshold=0.1, spectrum=None):
         """주파수 변화가 너무 없어서 지루한지 검사"""
         try:
             # Spectral Centroid 계산 (주파수 무게중심)
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sample_rate)[0]
-            
+            if spectrum is None:
+                spectrum = AudioQualityFilters._compute_shared_spectrum(audio_data, sample_rate)
+            spectral_centroids = spectrum['centroid']
+
             # 변화량 계산
             centroid_variance = np.var(spectral_centroids)
             centroid_mean = np.mean(spectral_centroids)
@@ -280,28 +548,246 @@ class AudioQualityFilters:
         except Exception as e:
             return {'passed': False, 'score': 0.0, 'reason': f'Monotony check error: {e}'}
         
+    @staticmethod
+    def check_melody_existence(audio_data, sample_rate, min_pitch_range=50.0, variance_threshold=100.0):
+        """우세 피치(멜로디)가 실제로 존재하는지 검사"""
+        try:
+            # YIN 피치 추적 - 프레임별 Python 루프 없이 1-D 피치 시리즈를 한 번에 계산
+            f0 = librosa.yin(audio_data, fmin=80, fmax=2000,
+                             sr=sample_rate, frame_length=2048)
+            dominant_pitches = f0[np.isfinite(f0) & (f0 > 0)]
+
+            if dominant_pitches.size == 0:
+                return {'passed': False, 'score': 0.0, 'reason': 'No dominant pitch detected'}
+
+            pitch_variance = float(dominant_pitches.var())
+            pitch_range = float(dominant_pitches.max() - dominant_pitches.min())
+
+            # 피치가 거의 움직이지 않으면 멜로디가 없다고 판단
+            if pitch_range < min_pitch_range:
+                return {
+                    'passed': False,
+                    'score': round(pitch_range / min_pitch_range, 3),
+                    'reason': f'Pitch range too narrow ({pitch_range:.0f}Hz)'
+                }
+
+            if pitch_variance < variance_threshold:
+                return {
+                    'passed': False,
+                    'score': round(pitch_variance / variance_threshold, 3),
+                    'reason': f'Pitch barely moves (variance: {pitch_variance:.1f})'
+                }
+
+            return {
+                'passed': True,
+                'score': 1.0,
+                'reason': f'Melody present (range {pitch_range:.0f}Hz)'
+            }
+
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Melody check error: {e}'}
+
+    @staticmethod
+    def check_rhythm_consistency(audio_data, sample_rate, min_tempo=40, max_tempo=220,
+                                 max_interval_cv=0.3, onset_envelope=None):
+        """템포가 합리적인 범위에 있고 비트 간격이 일정한지 검사"""
+        try:
+            # 미리 계산된 onset 포락선이 있으면 beat_track 내부 STFT를 건너뜀
+            if onset_envelope is not None:
+                tempo, beats = librosa.beat.beat_track(onset_envelope=onset_envelope,
+                                                       sr=sample_rate, hop_length=512)
+            else:
+                tempo, beats = librosa.beat.beat_track(y=audio_data, sr=sample_rate)
+            tempo = float(np.atleast_1d(tempo)[0])
+
+            if len(beats) < 4:
+                return {'passed': False, 'score': 0.0, 'reason': f'Too few beats ({len(beats)})'}
+
+            if not (min_tempo <= tempo <= max_tempo):
+                return {
+                    'passed': False,
+                    'score': 0.0,
+                    'reason': f'Tempo out of range ({tempo:.0f} BPM)'
+                }
+
+            # 비트 간격의 변동계수로 박자 안정성 판단
+            intervals = np.diff(beats)
+            interval_cv = float(intervals.std() / intervals.mean())
+
+            if interval_cv > max_interval_cv:
+                return {
+                    'passed': False,
+                    'score': round(max_interval_cv / interval_cv, 3),
+                    'reason': f'Unstable beat (interval CV: {interval_cv:.2f})'
+                }
+
+            return {'passed': True, 'score': 1.0, 'reason': f'Steady rhythm ({tempo:.0f} BPM)'}
+
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Rhythm check error: {e}'}
+
+    @staticmethod
+    def check_harmonic_balance(audio_data, sample_rate, min_harmonic_ratio=0.2,
+                               max_harmonic_ratio=0.98, spectrum=None):
+        """화성 성분과 타악 성분의 균형 검사"""
+        try:
+            # 스펙트로그램 영역 HPSS - iSTFT 복원 없이 에너지 비율만 계산
+            if spectrum is None:
+                spectrum = AudioQualityFilters._compute_shared_spectrum(audio_data, sample_rate)
+            H, P = librosa.decompose.hpss(spectrum['S'])
+
+            harmonic_energy = float(np.sum(H ** 2))
+            percussive_energy = float(np.sum(P ** 2))
+            total_energy = harmonic_energy + percussive_energy
+
+            if total_energy == 0:
+                return {'passed': False, 'score': 0.0, 'reason': 'No harmonic content (silent)'}
+
+            harmonic_ratio = harmonic_energy / total_energy
+
+            if harmonic_ratio < min_harmonic_ratio:
+                return {
+                    'passed': False,
+                    'score': round(harmonic_ratio / min_harmonic_ratio, 3),
+                    'reason': f'Too percussive/noisy (harmonic: {harmonic_ratio:.1%})'
+                }
+
+            if harmonic_ratio > max_harmonic_ratio:
+                return {
+                    'passed': False,
+                    'score': round((1 - harmonic_ratio) / (1 - max_harmonic_ratio), 3),
+                    'reason': f'No percussive movement (harmonic: {harmonic_ratio:.1%})'
+                }
+
+            return {'passed': True, 'score': 1.0, 'reason': f'Balanced (harmonic: {harmonic_ratio:.1%})'}
+
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Harmonic check error: {e}'}
+
+    @staticmethod
+    def check_musical_flow(audio_data, sample_rate, max_jump_ratio=0.2, spectrum=None):
+        """에너지 흐름이 부드럽게 이어지는지 검사"""
+        try:
+            if spectrum is None:
+                spectrum = AudioQualityFilters._compute_shared_spectrum(audio_data, sample_rate)
+            rms = librosa.feature.rms(S=spectrum['S'], frame_length=1024)[0]
+
+            mean_rms = float(rms.mean())
+            if mean_rms == 0:
+                return {'passed': False, 'score': 0.0, 'reason': 'No energy flow (silent)'}
+
+            # 평균 대비 프레임 간 에너지 점프 비율
+            delta = np.abs(np.diff(rms)) / mean_rms
+            jump_ratio = float(np.mean(delta > 0.5))
+
+            if jump_ratio > max_jump_ratio:
+                return {
+                    'passed': False,
+                    'score': round(max_jump_ratio / jump_ratio, 3),
+                    'reason': f'Energy jumps too abruptly ({jump_ratio:.1%} of frames)'
+                }
+
+            return {'passed': True, 'score': 1.0, 'reason': 'Smooth musical flow'}
+
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Flow check error: {e}'}
+
     @classmethod
-    def run_all_checks(cls, audio_data, sample_rate, expected_duration=12.0):
-        """3가지 핵심 검사만 실행"""
+    def run_musical_checks(cls, audio_data, sample_rate):
+        """4가지 음악적 완성도 검사를 병렬로 실행
+
+        librosa/scipy가 C FFT 구간에서 GIL을 풀기 때문에 독립적인
+        검사들은 스레드 풀에서 겹쳐 실행할 수 있다. 출력은 join 후에
+        모아서 한 번에 한다.
+        """
+        # 소리가 거의 없는 클립은 스펙트럼 계산 전에 조기 탈락
+        duration_result = cls.check_duration(audio_data, sample_rate)
+        if not duration_result['passed'] and duration_result['score'] < 0.5:
+            skipped = {'passed': False, 'score': 0.0,
+                       'reason': f"Skipped ({duration_result['reason']})"}
+            return {'rhythm': dict(skipped), 'melody': dict(skipped),
+                    'harmonic': dict(skipped), 'flow': dict(skipped),
+                    'overall_passed': False}
+
+        audio_data, sample_rate, spectrum = cls._prepare_checks(audio_data, sample_rate)
+
+        # beat_track이 내부에서 또 STFT를 돌리지 않도록 onset 포락선도 공유 스펙트럼에서 유도
+        onset_env = librosa.onset.onset_strength(
+            S=librosa.power_to_db(spectrum['S'] ** 2), sr=sample_rate)
+
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            futures = {
+                'rhythm': ex.submit(cls.check_rhythm_consistency, audio_data, sample_rate,
+                                    onset_envelope=onset_env),
+                'melody': ex.submit(cls.check_melody_existence, audio_data, sample_rate),
+                'harmonic': ex.submit(cls.check_harmonic_balance, audio_data, sample_rate,
+                                      spectrum=spectrum),
+                'flow': ex.submit(cls.check_musical_flow, audio_data, sample_rate,
+                                  spectrum=spectrum),
+            }
+            results = {name: future.result() for name, future in futures.items()}
+
+        for name, result in results.items():
+            print(f"      {name} 검사 완료: {result['reason']}")
+
+        results['overall_passed'] = all(r['passed'] for r in results.values())
+        return results
+
+    @classmethod
+    def run_all_checks(cls, audio_data, sample_rate, expected_duration=12.0,
+                       fast_fail=False):
+        """3가지 핵심 검사만 실행
+
+        fast_fail=True면 비용 오름차순(길이 → 고주파 → 극단 주파수)으로
+        돌다가 첫 실패에서 나머지를 건너뛴다. overall_passed만 필요한
+        호출자용 - 실패 원인 통계가 필요하면 기본값(False)을 쓴다.
+        """
         print(f"      길이 검사 중...")
-        duration_result = cls.check_duration(audio_data, sample_rate, expected_duration)
+        # NOTE: 예전 코드는 expected_duration을 active_threshold_db 자리에
+        # 넘겨서 길이 검사가 항상 실패했다 - 기본 임계값을 쓰도록 수정
+        duration_result = cls.check_duration(audio_data, sample_rate)
         print(f"      길이 검사 완료: {duration_result['reason']}")
-        
+
+        # 소리가 거의 없는 클립(또는 fast_fail 시 모든 길이 실패)은
+        # 스펙트럼 계산 없이 조기 탈락
+        if not duration_result['passed'] and (fast_fail
+                                              or duration_result['score'] < 0.5):
+            skipped = {'passed': False, 'score': 0.0,
+                       'reason': f"Skipped ({duration_result['reason']})"}
+            return {
+                'duration': duration_result,
+                'high_frequency': dict(skipped),
+                'extreme_frequencies': dict(skipped),
+                'overall_passed': False
+            }
+
+        # 검사용 샘플레이트로 정규화 후 공유 STFT를 한 번만 계산 (동일 버퍼면 캐시 적중)
+        audio_data, sample_rate, spectrum = cls._prepare_checks(audio_data, sample_rate)
+
         print(f"      고주파 노이즈 검사 중...")
-        high_freq_result = cls.check_high_frequency_noise(audio_data, sample_rate)
+        high_freq_result = cls.check_high_frequency_noise(audio_data, sample_rate, spectrum=spectrum)
         print(f"      고주파 검사 완료: {high_freq_result['reason']}")
-        
+
+        if fast_fail and not high_freq_result['passed']:
+            return {
+                'duration': duration_result,
+                'high_frequency': high_freq_result,
+                'extreme_frequencies': {'passed': False, 'score': 0.0,
+                                        'reason': 'Skipped (earlier check failed)'},
+                'overall_passed': False
+            }
+
         print(f"      극단 주파수 검사 중...")
-        extreme_freq_result = cls.check_extreme_frequencies(audio_data, sample_rate)
+        extreme_freq_result = cls.check_extreme_frequencies(audio_data, sample_rate, spectrum=spectrum)
         print(f"      극단 주파수 검사 완료: {extreme_freq_result['reason']}")
-        
+
         # 전체 통과 여부
         overall_passed = all([
             duration_result['passed'],
             high_freq_result['passed'],
             extreme_freq_result['passed']
         ])
-        
+
         return {
             'duration': duration_result,
             'high_frequency': high_freq_result,
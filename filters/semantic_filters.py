@@ -0,0 +1,444 @@
+"""프롬프트-오디오 의미 일치 검사 필터 (CLAP 기반)"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# 선택 의존성: msclap (CLAP 모델). 미설치 환경에서는 의미 검사 생략
+try:
+    from msclap import CLAP
+except ImportError:
+    CLAP = None
+
+# 모듈 수준 CLAP 싱글턴 - 인스턴스를 다시 만들어도 모델 로드는 한 번만
+_CLAP_SINGLETON = None
+_CLAP_LOAD_FAILED = False
+_CLAP_SINGLETON_LOCK = threading.Lock()
+
+
+def _get_clap_singleton(use_cuda):
+    """공유 CLAP 인스턴스를 지연 생성해 반환 (미설치/로드 실패 시 None)"""
+    global _CLAP_SINGLETON, _CLAP_LOAD_FAILED
+    if CLAP is None or _CLAP_LOAD_FAILED:
+        return None
+    if _CLAP_SINGLETON is None:
+        with _CLAP_SINGLETON_LOCK:
+            if _CLAP_SINGLETON is None and not _CLAP_LOAD_FAILED:
+                try:
+                    _CLAP_SINGLETON = CLAP(version='2023', use_cuda=use_cuda)
+                    print("CLAP 모델 로딩 완료")
+                except Exception as e:
+                    print(f"CLAP 모델 로딩 실패: {e}")
+                    _CLAP_LOAD_FAILED = True
+    return _CLAP_SINGLETON
+
+
+def _release_clap_singleton():
+    """공유 CLAP 인스턴스를 해제 (다음 사용 시 다시 로드)"""
+    global _CLAP_SINGLETON, _CLAP_LOAD_FAILED
+    with _CLAP_SINGLETON_LOCK:
+        _CLAP_SINGLETON = None
+        _CLAP_LOAD_FAILED = False
+
+# 선택 의존성: pyahocorasick (키워드 다중 매칭 오토마톤). 없으면 부분문자열 스캔 사용
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 선택 의존성: numba - 유사도 클리핑+가중합 후처리를 단일 커널로 융합
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# CLAP 입력용 임시 WAV 저장 위치 - 리눅스에서는 RAM 기반 /dev/shm을 사용해
+# 일회성 파일이 디스크를 거치지 않게 한다
+_TMPDIR = ('/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK)
+           else tempfile.gettempdir())
+
+# 구성 요소 순서: [전체 프롬프트, 감정, 장르, 악기]
+_COMPONENT_WEIGHTS = np.array([0.4, 0.3, 0.2, 0.1], dtype=np.float32)
+
+# 프롬프트에 없는 구성 요소에 부여하는 기본 점수
+_MISSING_COMPONENT_SCORE = 0.15
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _clip_mask_weight(sims, weights, present, default):
+        """클리핑 + 결측 구성 요소 마스킹 + 가중합을 한 패스로 계산"""
+        out = np.empty(sims.shape[0], dtype=np.float32)
+        total = 0.0
+        for i in range(sims.shape[0]):
+            v = sims[i]
+            if v < 0.0:
+                v = 0.0
+            elif v > 1.0:
+                v = 1.0
+            if not present[i]:
+                v = default
+            out[i] = v
+            total += v * weights[i]
+        return out, total
+
+    _clip_mask_weight(np.zeros(4, dtype=np.float32), _COMPONENT_WEIGHTS,
+                      np.ones(4, dtype=np.bool_), 0.0)
+else:
+    _clip_mask_weight = None
+
+
+_GENRE_REGEXES = (
+    re.compile(r'\b(jazz|rock|pop|classical|electronic|hip[- ]?hop|ambient|folk|blues|funk|metal|reggae|techno|house|lo[- ]?fi)\b'),
+)
+
+_EMOTION_KEYWORDS = (
+    'happy', 'sad', 'calm', 'energetic', 'dark', 'uplifting', 'melancholic',
+    'peaceful', 'aggressive', 'dreamy', 'romantic', 'tense', 'cheerful',
+    'nostalgic', 'relaxing', 'epic',
+)
+
+# 긴 키워드 우선 ("upright bass"가 "bass"보다 먼저 매칭되도록)
+_INSTRUMENT_KEYWORDS = (
+    'upright bass', 'electric guitar', 'acoustic guitar', 'piano', 'guitar',
+    'violin', 'drums', 'synth', 'saxophone', 'trumpet', 'flute', 'cello',
+    'bass', 'organ', 'harp', 'strings',
+)
+
+
+def _build_keyword_automaton():
+    """감정+악기 키워드 전체를 한 번의 O(n) 패스로 찾는 오토마톤 구성"""
+    automaton = ahocorasick.Automaton()
+    for category, keywords in (('emotion', _EMOTION_KEYWORDS),
+                               ('instrument', _INSTRUMENT_KEYWORDS)):
+        for keyword in keywords:
+            automaton.add_word(keyword, (category, keyword))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if ahocorasick is not None else None
+
+
+class SemanticMatchingFilters:
+    """생성된 음악이 프롬프트 의도와 맞는지 CLAP 유사도로 검사"""
+
+    # 임베딩 캐시 상한 (오디오 32개 ≈ 수 MB, 텍스트는 세션 전체에서 반복됨)
+    _AUDIO_CACHE_SIZE = 32
+    _TEXT_CACHE_SIZE = 256
+
+    def __init__(self, embedding_precision=None):
+        # CLAP은 첫 check_prompt_alignment 호출 때 지연 로드
+        # (오디오 필터만 쓰는 실행에서 ~500MB VRAM/로딩 시간 절약)
+        self.clap = None
+        self._clap_loaded = False
+        self._clap_lock = threading.Lock()
+        self._audio_emb_cache = OrderedDict()
+        self._text_emb_cache = OrderedDict()
+        # CUDA에서는 기본 FP16 autocast로 인코더 forward를 돌린다
+        self.embedding_precision = embedding_precision
+        if self.embedding_precision is None:
+            try:
+                import torch
+                self.embedding_precision = (torch.float16 if torch.cuda.is_available()
+                                            else torch.float32)
+            except ImportError:
+                pass
+
+    def _get_clap(self):
+        """CLAP 모델을 첫 사용 시점에 한 번만 로드하고 반환"""
+        if not self._clap_loaded:
+            with self._clap_lock:
+                if not self._clap_loaded:
+                    self._initialize_clap()
+                    self._clap_loaded = True
+        return self.clap
+
+    def release(self):
+        """CLAP 모델과 임베딩 캐시를 해제 (장시간 세션의 VRAM 반환용)"""
+        with self._clap_lock:
+            self.clap = None
+            self._clap_loaded = False
+            self._audio_emb_cache.clear()
+            self._text_emb_cache.clear()
+        _release_clap_singleton()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def _initialize_clap(self):
+        """공유 CLAP 싱글턴 연결 (msclap 미설치 환경에서는 의미 검사 생략)"""
+        self.clap = _get_clap_singleton(self._cuda_available())
+
+    def _forward_context(self):
+        """CLAP forward용 컨텍스트 - CUDA + FP16 설정이면 autocast, 아니면 no-op
+
+        임베딩은 호출부에서 FP32로 되돌려 코사인 유사도의 수치 안정성을
+        유지한다.
+        """
+        try:
+            import torch
+            if (torch.cuda.is_available()
+                    and self.embedding_precision == torch.float16):
+                return torch.autocast('cuda', dtype=torch.float16)
+        except ImportError:
+            pass
+        return contextlib.nullcontext()
+
+    @staticmethod
+    def _to_float32(embedding):
+        """autocast가 남긴 FP16 임베딩을 FP32로 승격 (텐서가 아니면 그대로)"""
+        return embedding.float() if hasattr(embedding, 'float') else embedding
+
+    @staticmethod
+    def _cuda_available():
+        try:
+            import torch
+            return torch.cuda.is_available()
+        except ImportError:
+            return False
+
+    def parse_prompt_components(self, prompt):
+        """프롬프트에서 장르/감정/악기 구성 요소 추출"""
+        lower_prompt = prompt.lower()
+        components = {'genre': None, 'emotion': None, 'instrument': None}
+
+        for regex in _GENRE_REGEXES:
+            match = regex.search(lower_prompt)
+            if match:
+                components['genre'] = match.group(1)
+                break
+
+        if _KEYWORD_AUTOMATON is not None:
+            # 감정+악기 키워드를 단일 O(n) 패스로 매칭, 카테고리별 최장 일치 유지
+            for _, (category, keyword) in _KEYWORD_AUTOMATON.iter(lower_prompt):
+                current = components[category]
+                if current is None or len(keyword) > len(current):
+                    components[category] = keyword
+        else:
+            for keyword in _EMOTION_KEYWORDS:
+                if keyword in lower_prompt:
+                    components['emotion'] = keyword
+                    break
+            for keyword in _INSTRUMENT_KEYWORDS:
+                if keyword in lower_prompt:
+                    components['instrument'] = keyword
+                    break
+
+        return components
+
+    def check_prompt_alignment(self, audio_data, sample_rate, prompt, min_score=0.2):
+        """오디오가 프롬프트와 의미적으로 일치하는지 검사
+
+        오디오 임베딩은 한 번만 계산하고 전체 프롬프트 + 구성 요소
+        텍스트들을 하나의 배치로 인코딩해 유사도를 행렬 곱 한 번으로
+        얻는다 (구성 요소별 개별 forward 없음).
+        """
+        if self._get_clap() is None:
+            return {'passed': True, 'score': 1.0,
+                    'reason': 'CLAP not available - semantic check skipped'}
+
+        try:
+            audio_emb = self._get_audio_embedding(audio_data, sample_rate)
+            return self._score_alignment(audio_emb, prompt, min_score)
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Alignment check error: {e}'}
+
+    def check_prompt_alignment_gpu(self, wav_tensor, sample_rate, prompt, min_score=0.2):
+        """GPU에 올라와 있는 생성 텐서로 직접 의미 일치 검사
+
+        MusicGen 출력이 이미 CUDA 텐서일 때 NumPy 변환 → 임시 WAV →
+        재업로드 왕복 없이 CLAP 오디오 인코더에 텐서를 그대로 넘긴다.
+        텐서 경로를 쓸 수 없는 msclap 버전에서는 CPU 경로로 폴백한다.
+        """
+        if self._get_clap() is None:
+            return {'passed': True, 'score': 1.0,
+                    'reason': 'CLAP not available - semantic check skipped'}
+
+        try:
+            audio_emb = self._audio_embedding_from_tensor(wav_tensor, sample_rate)
+            if audio_emb is None:
+                audio_np = wav_tensor.detach().cpu().numpy().ravel()
+                return self.check_prompt_alignment(audio_np, sample_rate, prompt,
+                                                   min_score=min_score)
+            return self._score_alignment(audio_emb, prompt, min_score)
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Alignment check error: {e}'}
+
+    def _score_alignment(self, audio_emb, prompt, min_score):
+        """오디오 임베딩과 프롬프트 구성 요소 텍스트의 가중 유사도 채점"""
+        try:
+            components = self.parse_prompt_components(prompt)
+
+            # 비어 있는 구성 요소는 자리표시 텍스트를 넣고 나중에 기본값으로 마스킹
+            texts = [
+                prompt,
+                f"{components['emotion']} music" if components['emotion'] else prompt,
+                f"{components['genre']} music" if components['genre'] else prompt,
+                f"music with {components['instrument']}" if components['instrument'] else prompt,
+            ]
+
+            # 텍스트 배치 인코딩 1회 + 유사도 행렬 1회
+            # (동일 텍스트 재질의는 캐시에서 바로 가져옴)
+            text_embs = self._get_text_embeddings(tuple(texts))
+            similarity = self.clap.compute_similarity(audio_emb, text_embs)
+
+            sims = np.ascontiguousarray(
+                similarity.detach().cpu().numpy().ravel()[:4], dtype=np.float32)
+            present = np.array([True, bool(components['emotion']),
+                                bool(components['genre']),
+                                bool(components['instrument'])])
+
+            if _clip_mask_weight is not None:
+                values, weighted_score = _clip_mask_weight(
+                    sims, _COMPONENT_WEIGHTS, present, _MISSING_COMPONENT_SCORE)
+            else:
+                np.clip(sims, 0.0, 1.0, out=sims)
+                values = np.where(present, sims, _MISSING_COMPONENT_SCORE)
+                weighted_score = float(_COMPONENT_WEIGHTS @ values)
+
+            scores = {
+                'full_prompt': float(values[0]),
+                'emotion': float(values[1]),
+                'genre': float(values[2]),
+                'instrument': float(values[3]),
+            }
+            # 지연 포맷팅: DEBUG가 꺼져 있으면 인자 평가만 하고 문자열은 안 만든다
+            logger.debug("prompt alignment weighted=%.3f components=%s",
+                         weighted_score, scores)
+
+            if weighted_score < min_score:
+                return {
+                    'passed': False,
+                    'score': round(weighted_score, 3),
+                    'reason': f'Weak prompt alignment ({weighted_score:.2f})',
+                    'component_scores': scores
+                }
+
+            return {
+                'passed': True,
+                'score': round(weighted_score, 3),
+                'reason': f'Prompt alignment OK ({weighted_score:.2f})',
+                'component_scores': scores
+            }
+
+        except Exception as e:
+            return {'passed': False, 'score': 0.0, 'reason': f'Alignment check error: {e}'}
+
+    def _get_audio_embedding(self, audio_data, sample_rate):
+        """오디오 임베딩 LRU 캐시 (버퍼 해시 키)
+
+        재검사/진단 재실행처럼 같은 오디오를 다시 물어보는 경우
+        인코더 forward를 건너뛴다. 인코딩은 디스크 왕복 없는 텐서
+        경로를 먼저 시도하고, 실패 시에만 임시 WAV로 폴백한다.
+        """
+        key = hashlib.blake2b(audio_data.tobytes(), digest_size=16).digest()
+        cached = self._audio_emb_cache.get(key)
+        if cached is not None:
+            self._audio_emb_cache.move_to_end(key)
+            return cached
+
+        embedding = self._audio_embedding_from_tensor(audio_data, sample_rate)
+        if embedding is None:
+            temp_path = self._save_temp_audio_file(audio_data, sample_rate)
+            try:
+                with self._forward_context():
+                    embedding = self.clap.get_audio_embeddings([temp_path])
+                embedding = self._to_float32(embedding)
+            finally:
+                self._cleanup_temp_file(temp_path)
+
+        self._audio_emb_cache[key] = embedding
+        if len(self._audio_emb_cache) > self._AUDIO_CACHE_SIZE:
+            self._audio_emb_cache.popitem(last=False)
+        return embedding
+
+    def _audio_embedding_from_tensor(self, audio_data, sample_rate):
+        """WAV 인코드/디코드 없이 텐서에서 바로 오디오 임베딩 계산
+
+        msclap 내부 오디오 인코더를 직접 호출한다. 내부 구조가 다른
+        버전에서는 None을 반환해 호출부가 파일 경로로 폴백한다.
+        """
+        try:
+            import torch
+            import torchaudio
+
+            args = getattr(self.clap, 'args', None)
+            encoder = getattr(getattr(self.clap, 'clap', None), 'audio_encoder', None)
+            if args is None or encoder is None:
+                return None
+
+            target_sr = int(getattr(args, 'sampling_rate', 44100))
+            if torch.is_tensor(audio_data):
+                # 이미 텐서(GPU 상주 포함)면 복사 없이 그대로 사용
+                wav = audio_data.detach()
+                if wav.dtype != torch.float32:
+                    wav = wav.float()
+            else:
+                wav = torch.from_numpy(
+                    np.ascontiguousarray(audio_data, dtype=np.float32))
+            if wav.dim() > 1:
+                wav = wav.mean(dim=0)
+            if sample_rate != target_sr:
+                wav = torchaudio.functional.resample(wav, sample_rate, target_sr)
+
+            # msclap과 동일하게 고정 길이로 자르거나 반복 패딩
+            target_len = int(getattr(args, 'duration', 7)) * target_sr
+            if wav.numel() < target_len:
+                repeats = -(-target_len // wav.numel())
+                wav = wav.repeat(repeats)[:target_len]
+            else:
+                wav = wav[:target_len]
+
+            device = next(encoder.parameters()).device
+            batch = wav.reshape(1, -1).to(device)
+            with torch.no_grad(), self._forward_context():
+                embedding = encoder(batch)[0]
+            return self._to_float32(embedding)
+        except Exception:
+            return None
+
+    def _get_text_embeddings(self, texts):
+        """텍스트 배치 임베딩 LRU 캐시 (텍스트 튜플 키)
+
+        장르/감정/악기 템플릿은 세션 내에서 반복되므로 적중률이 높다.
+        """
+        cached = self._text_emb_cache.get(texts)
+        if cached is not None:
+            self._text_emb_cache.move_to_end(texts)
+            return cached
+
+        with self._forward_context():
+            embeddings = self.clap.get_text_embeddings(list(texts))
+        embeddings = self._to_float32(embeddings)
+        self._text_emb_cache[texts] = embeddings
+        if len(self._text_emb_cache) > self._TEXT_CACHE_SIZE:
+            self._text_emb_cache.popitem(last=False)
+        return embeddings
+
+    @staticmethod
+    def _save_temp_audio_file(audio_data, sample_rate):
+        """CLAP 입력용 임시 WAV 저장"""
+        fd, temp_path = tempfile.mkstemp(suffix='.wav', dir=_TMPDIR)
+        os.close(fd)
+        sf.write(temp_path, audio_data, sample_rate)
+        return temp_path
+
+    @staticmethod
+    def _cleanup_temp_file(temp_path):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -15,6 +15,9 @@ import os
 from pipeline.quality_pipeline import MusicQualityPipeline
 from utils.audio_utils import print_separator, ensure_output_directory
 
+# 파이프 입력에서 한 번의 배치 forward로 묶을 최대 프롬프트 수
+MAX_PROMPT_BATCH = 8
+
 
 def print_welcome():
     """환영 메시지 출력"""
@@ -58,6 +61,46 @@ def validate_prompt(prompt):
     return True
 
 
+def run_piped_sessions(pipeline):
+    """파이프/파일로 들어온 프롬프트를 묶어서 배치 생성으로 처리
+
+    스크립트 입력은 프롬프트가 이미 다 준비돼 있으므로 한 줄씩 전체
+    파이프라인을 돌리는 대신 MAX_PROMPT_BATCH개씩 모아 한 번의 배치
+    forward로 생성한다. 처리한 세션 수를 반환.
+    """
+    prompts = []
+    for line in sys.stdin:
+        line = line.strip()
+        if line.lower() in ('quit', 'exit', 'q'):
+            break
+        if validate_prompt(line):
+            prompts.append(line)
+
+    session_count = 0
+    for start in range(0, len(prompts), MAX_PROMPT_BATCH):
+        group = prompts[start:start + MAX_PROMPT_BATCH]
+        print(f"\n🎵 세션 {session_count + 1}~{session_count + len(group)} 시작... (프롬프트 {len(group)}개 배치)")
+
+        try:
+            results = pipeline.process_prompts(group, batch_size=5)
+        except KeyboardInterrupt:
+            print("\n\n⏹️  생성을 중단했습니다.")
+            break
+        except Exception as e:
+            print(f"\n❌ 오류가 발생했습니다: {e}")
+            print("💡 다시 시도해보세요.")
+            continue
+
+        session_count += len(group)
+        for result in results:
+            if result['summary']['success_count'] > 0:
+                print(f"\n🎉 '{result['prompt']}': {result['summary']['success_count']}개의 좋은 음악이 생성되었습니다!")
+            else:
+                print(f"\n😅 '{result['prompt']}': 품질 기준을 통과한 음악이 없네요.")
+
+    return session_count
+
+
 def main():
     """메인 함수"""
     print_welcome()
@@ -76,9 +119,18 @@ def main():
         print("💡 audiocraft 라이브러리와 모델이 올바르게 설치되었는지 확인하세요.")
         return 1
     
-    # 메인 루프
+    # 파이프/파일 입력이면 프롬프트를 모아 배치 생성으로 처리
+    if not sys.stdin.isatty():
+        session_count = run_piped_sessions(pipeline)
+        if session_count > 0:
+            print(f"\n📈 총 {session_count}개의 세션을 처리했습니다.")
+            print(f"📁 생성된 파일들은 '{output_dir}' 폴더에서 확인할 수 있습니다.")
+        print("\n🎵 감사합니다!")
+        return 0
+
+    # 메인 루프 (대화형)
     session_count = 0
-    
+
     while True:
         prompt = get_user_input()
         
@@ -1,11 +1,14 @@
-from .music_generator import MusicGenerator
-from .quality_pipeline import MusicQualityPipeline  
+from .music_generator import MusicGenerator, get_music_generator
+from .quality_pipeline import MusicQualityPipeline
 from .adaptive_pipeline import AdaptiveMusicQualityPipeline
+from .enhanced_pipeline import EnhancedQualityPipeline
 
 __all__ = [
     'MusicGenerator',
+    'get_music_generator',         # 공유 생성기 싱글턴
     'MusicQualityPipeline',        # 기존 배치 처리
-    'AdaptiveMusicQualityPipeline' # 새로운 적응형 처리
+    'AdaptiveMusicQualityPipeline', # 새로운 적응형 처리
+    'EnhancedQualityPipeline'      # 평가 전용 2단계 파이프라인
 ]
 
 # 버전 정보
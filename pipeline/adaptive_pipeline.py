@@ -1,96 +1,254 @@
+import logging
 import os
+import sys
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from audiocraft.data.audio import audio_write
-from .music_generator import MusicGenerator
+from .music_generator import get_music_generator
 from filters.audio_filters import AudioQualityFilters
 
+# 검사별 상세 로그는 DEBUG 레벨 - 기본 설정에서는 포맷팅 비용조차 들지 않음
+logger = logging.getLogger(__name__)
+
+# 리포트 배너는 매번 '='*60으로 새로 만들지 않고 상수로 재사용
+_BAR60 = "=" * 60
+
 
 class AdaptiveMusicQualityPipeline:
     """적응형 음악 품질 파이프라인 - 품질 통과까지 재생성"""
     
-    def __init__(self, output_dir="output"):
+    def __init__(self, output_dir="output", save_failures=False,
+                 max_attempts=10, repeat_failure_threshold=3,
+                 candidates_per_round=1, speculative_generation=False):
         self.output_dir = output_dir
-        self.generator = MusicGenerator()
+        # 파이프라인 여러 개가 한 프로세스에 공존해도 생성기는 하나만
+        self.generator = get_music_generator()
         self.filters = AudioQualityFilters()
-        
+        # 실패한 시도의 WAV도 저장할지 여부 (기본: 저장 안 함)
+        self.save_failures = save_failures
+        # 재시도 상한: 전체 시도 수 / 동일 실패 원인 반복 횟수
+        # (어려운 프롬프트가 GPU를 무한정 붙잡지 않도록)
+        self.max_attempts = max_attempts
+        self.repeat_failure_threshold = repeat_failure_threshold
+        # 라운드당 후보 수: 2 이상이면 한 번의 배치 forward로 후보를
+        # 미리 생성해 두고 하나씩 검사한다 (텍스트 인코딩이 라운드당 1회)
+        self.candidates_per_round = max(1, candidates_per_round)
+        # 투기적 생성: 채점이 끝나기 전에 다음 시도를 미리 돌린다.
+        # 숨길 수 있는 검사 시간(~0.3초)보다 통과 시 버려지는 forward
+        # (~수십 초)가 훨씬 비싸므로 기본은 끄고, 실패가 잦은 프롬프트를
+        # 반복 처리하는 경우에만 켠다
+        self.speculative_generation = speculative_generation
+        # 오디오 버퍼는 가장 양호한 시도 하나만 유지 (O(시도 수) 메모리 방지)
+        self._best_attempt_audio = None
+        # WAV 인코딩/디스크 쓰기는 별도 I/O 풀에서 진행 - 재시도 루프가
+        # fsync를 기다리지 않는다 (리포트 직전에 한 번만 동기화)
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._pending_saves = []
+
         # 출력 디렉토리 생성
         os.makedirs(output_dir, exist_ok=True)
-        
+
+        # 콜드 스타트 제거: 첫 프롬프트가 N번째 프롬프트만큼 빠르게
+        self._warmup()
+
+    def _warmup(self):
+        """생성기/필터를 더미 입력으로 한 번 돌려 초기화 비용을 선불"""
+        print("파이프라인 워밍업 중...")
+        warmup_start_ns = time.monotonic_ns()
+
+        self.generator.warmup()
+
+        # 필터 워밍업: 12초 무음으로 STFT 플랜/numba 커널/librosa 캐시 예열
+        # (결과는 버린다)
+        try:
+            import numpy as np
+            silence = np.zeros(int(12.0 * 32000), dtype=np.float32)
+            self.filters.run_all_checks(silence, 32000)
+        except Exception as e:
+            print(f"필터 워밍업 실패 (무시): {e}")
+
+        print(f"워밍업 완료 ({(time.monotonic_ns() - warmup_start_ns) / 1e9:.1f}초)")
+
     def process_prompt_adaptive(self, prompt):
         """품질 통과까지 재생성하는 적응형 처리"""
-        start_time = time.time()
+        t0 = time.perf_counter_ns()
         
         print(f"프롬프트: '{prompt}'")
         print(f"목표: 품질 검사 통과한 음악 1개 생성")
-        print("=" * 60)
+        print(_BAR60)
         
         attempts = []
         attempt_count = 0
-        
-        while True:
-            attempt_count += 1
-            print(f"\n시도 {attempt_count}")
-            
-            # 1. 음악 생성
-            print(f"  음악 생성 중...", end=" ")
-            gen_result = self.generator.generate_single(prompt)
-            
-            if not gen_result['success']:
-                print(f"실패: {gen_result['error']}")
+        self._best_attempt_audio = None
+        self._pending_saves = []
+
+        # 배치 라운드 모드에서 아직 검사하지 않은 후보들
+        pending_candidates = []
+
+        def generate_next():
+            """생성 성공할 때까지 반복하고 (시도 번호, 생성 결과)를 반환
+
+            candidates_per_round > 1이면 라운드 분량을 배치 forward 한 번으로
+            미리 생성해 두고 하나씩 꺼낸다. 생성 실패가 이어진 채로
+            max_attempts에 도달하면 (시도 번호, None)을 반환해 무한 재시도를
+            막는다 - CUDA OOM처럼 저절로 풀리지 않는 오류 대비.
+            """
+            nonlocal attempt_count
+            while True:
+                attempt_count += 1
+                print(f"\n시도 {attempt_count}")
+
+                # 1. 음악 생성 (배치 모드면 남은 후보부터 소비)
+                if self.candidates_per_round > 1:
+                    if not pending_candidates:
+                        pending_candidates.extend(self.generator.generate_batch(
+                            prompt, self.candidates_per_round))
+                    gen_result = pending_candidates.pop(0)
+                    if gen_result['success']:
+                        print(f"  (배치 생성분, 곡당 {gen_result['generation_time']:.1f}초)")
+                        return attempt_count, gen_result
+                    print(f"  생성 실패: {gen_result['error']}")
+                else:
+                    print(f"  음악 생성 중...", end=" ")
+                    gen_result = self.generator.generate_single(prompt)
+
+                    if gen_result['success']:
+                        print(f"완료 ({gen_result['generation_time']:.1f}초)")
+                        return attempt_count, gen_result
+
+                    print(f"실패: {gen_result['error']}")
                 attempts.append({
                     'attempt': attempt_count,
                     'success': False,
                     'error': gen_result['error'],
                     'generation_time': 0
                 })
+                if attempt_count >= self.max_attempts:
+                    print(f"  생성 실패인 채로 최대 시도 횟수({self.max_attempts}회)에 도달해 중단합니다.")
+                    return attempt_count, None
                 print(f"  다시 시도합니다...")
-                continue
-            
-            print(f"완료 ({gen_result['generation_time']:.1f}초)")
-            
-            # 2. 품질 검사
-            print(f"  품질 검사 중...")
-            quality_result = self._run_quality_checks_with_log(
-                gen_result['audio_data'], 
-                gen_result['sample_rate']
-            )
-            
-            # 3. 파일 저장
-            filename = self._save_attempt_file(
-                gen_result, quality_result, attempt_count
-            )
-            
-            # 4. 시도 기록
-            attempt_record = {
-                'attempt': attempt_count,
-                'success': True,
-                'passed': quality_result['overall_passed'],
-                'filename': filename,
-                'quality': quality_result,
-                'generation_time': gen_result['generation_time'],
-                'audio_data': gen_result['audio_data'],
-                'sample_rate': gen_result['sample_rate'],
-                'wav_tensor': gen_result['wav_tensor']
-            }
-            attempts.append(attempt_record)
-            
-            # 5. 결과 출력 및 종료 조건 확인
-            if quality_result['overall_passed']:
-                print(f"  품질 검사 통과!")
-                print(f"  저장됨: {filename}")
-                break
-            else:
-                print(f"  품질 검사 실패")
-                self._print_failure_reasons(quality_result)
-                print(f"  저장됨: {filename}")
-                print(f"  다시 시도합니다...")
-        
-        # 6. 최종 결과 처리
-        total_time = time.time() - start_time
-        final_result = attempts[-1]  # 마지막(성공한) 시도
+
+        # 동일 실패 원인 반복 감지용 카운터
+        failure_counter = Counter()
+
+        # 품질 검사는 워커 스레드에서 돌리고, 투기 모드에서는 그 사이에
+        # 다음 시도를 미리 생성 (생성은 GPU, 검사는 CPU 위주라 경합 없음)
+        with ThreadPoolExecutor(max_workers=1) as check_pool:
+            number, gen_result = generate_next()
+            if gen_result is not None:
+                print(f"  품질 검사 중... (백그라운드)")
+                check_future = check_pool.submit(
+                    self._run_quality_checks_with_log,
+                    gen_result['audio_data'],
+                    gen_result['sample_rate']
+                )
+
+            while gen_result is not None:
+                # 2. 투기 모드에서만 채점이 끝나기 전에 다음 시도를 생성
+                #    (현재 시도가 통과하면 그 forward는 통째로 버려진다)
+                if self.speculative_generation:
+                    next_number, next_gen = generate_next()
+                else:
+                    next_number, next_gen = None, None
+
+                # 3. 현재 시도 판정 확정
+                quality_result = check_future.result()
+
+                # 4. 파일 저장
+                filename = self._save_attempt_file(
+                    gen_result, quality_result, number
+                )
+
+                # 5. 시도 기록 - 메타데이터만 저장 (오디오 버퍼를 시도마다
+                #    들고 있으면 메모리가 시도 수에 비례해 불어남)
+                attempt_record = {
+                    'attempt': number,
+                    'success': True,
+                    'passed': quality_result['overall_passed'],
+                    'filename': filename,
+                    'quality': quality_result,
+                    'generation_time': gen_result['generation_time'],
+                    'sample_rate': gen_result['sample_rate']
+                }
+                attempts.append(attempt_record)
+
+                # 오디오 버퍼는 가장 양호한 시도 하나만 별도 슬롯에 유지
+                if (self._best_attempt_audio is None
+                        or self._attempt_rank(attempt_record)
+                        > self._attempt_rank(self._best_attempt_audio['record'])):
+                    self._best_attempt_audio = {
+                        'record': attempt_record,
+                        'audio_data': gen_result['audio_data'],
+                        'wav_tensor': gen_result['wav_tensor']
+                    }
+
+                # 6. 결과 출력 및 종료 조건 확인
+                if quality_result['overall_passed']:
+                    print(f"\n  시도 {number} 품질 검사 통과!")
+                    print(f"  저장됨: {filename}")
+                    break
+                else:
+                    print(f"\n  시도 {number} 품질 검사 실패")
+                    self._print_failure_reasons(quality_result)
+                    print(f"  저장됨: {filename}")
+
+                # 7. 재시도 상한 확인 (시도 수 / 동일 원인 반복)
+                failure_counter.update(
+                    check_result['reason']
+                    for check_name, check_result in quality_result.items()
+                    if check_name != 'overall_passed'
+                    and not check_result['passed']
+                    and not check_result['reason'].startswith('Skipped'))
+
+                repeated = [reason for reason, count in failure_counter.items()
+                            if count >= self.repeat_failure_threshold]
+                if repeated:
+                    print(f"\n  동일 실패 원인이 {self.repeat_failure_threshold}회 반복되어 중단합니다:")
+                    for reason in repeated:
+                        print(f"    - {reason}")
+                    break
+                if number >= self.max_attempts:
+                    print(f"\n  최대 시도 횟수({self.max_attempts}회)에 도달해 중단합니다.")
+                    break
+
+                # 8. 다음 시도 확보 - 비투기 모드는 실패가 확정된 여기서
+                #    생성하고, 투기 모드는 미리 생성해 둔 것을 쓴다
+                if not self.speculative_generation:
+                    next_number, next_gen = generate_next()
+                # 생성 쪽에서 이미 상한에 걸렸으면 더 검사할 시도가 없다
+                if next_gen is None:
+                    break
+
+                number, gen_result = next_number, next_gen
+                print(f"  품질 검사 중... (백그라운드)")
+                check_future = check_pool.submit(
+                    self._run_quality_checks_with_log,
+                    gen_result['audio_data'],
+                    gen_result['sample_rate']
+                )
         
+        # 저장이 백그라운드에서 진행 중일 수 있으므로 리포트 전에 동기화
+        for save_future in self._pending_saves:
+            try:
+                save_future.result()
+            except Exception as e:
+                print(f"  파일 저장 오류: {e}")
+        self._pending_saves = []
+
+        # 6. 최종 결과 처리 (통과한 시도가 없으면 가장 양호한 시도를 선택)
+        total_time = (time.perf_counter_ns() - t0) / 1e9
+        final_result = self._select_best_attempt(attempts)
+
+        # 최종 시도에만 오디오 버퍼를 다시 붙인다
+        if (final_result is not None and self._best_attempt_audio is not None
+                and self._best_attempt_audio['record'] is final_result):
+            final_result = dict(final_result,
+                                audio_data=self._best_attempt_audio['audio_data'],
+                                wav_tensor=self._best_attempt_audio['wav_tensor'])
+
         # 7. 종합 리포트 생성
-        summary = self._generate_adaptive_summary(attempts, total_time, prompt)
+        summary = self._generate_adaptive_summary(attempts, total_time, prompt, final_result)
         
         pipeline_result = {
             'prompt': prompt,
@@ -105,73 +263,100 @@ class AdaptiveMusicQualityPipeline:
         return pipeline_result
     
     def _run_quality_checks_with_log(self, audio_data, sample_rate):
-        """품질 검사를 로그와 함께 실행"""
-        # 길이 검사
-        print(f"    길이 검사...", end=" ")
-        duration_result = self.filters.check_duration(audio_data, sample_rate)
-        if duration_result['passed']:
-            print(f"통과: {duration_result['reason']}")
-        else:
-            print(f"실패: {duration_result['reason']}")
-        
-        # 고주파 노이즈 검사
-        print(f"    고주파 노이즈 검사...", end=" ")
-        high_freq_result = self.filters.check_high_frequency_noise(audio_data, sample_rate)
-        if high_freq_result['passed']:
-            print(f"통과: {high_freq_result['reason']}")
-        else:
-            print(f"실패: {high_freq_result['reason']}")
-        
-        # 극단 주파수 검사
-        print(f"    극단 주파수 검사...", end=" ")
-        extreme_freq_result = self.filters.check_extreme_frequencies(audio_data, sample_rate)
-        if extreme_freq_result['passed']:
-            print(f"통과: {extreme_freq_result['reason']}")
-        else:
-            print(f"실패: {extreme_freq_result['reason']}")
-        
-        # 전체 통과 여부
-        overall_passed = all([
-            duration_result['passed'],
-            high_freq_result['passed'],
-            extreme_freq_result['passed']
-        ])
-        
-        return {
-            'duration': duration_result,
-            'high_frequency': high_freq_result,
-            'extreme_frequencies': extreme_freq_result,
-            'overall_passed': overall_passed
-        }
+        """품질 검사를 로그와 함께 실행 (싼 검사부터, 실패 시 조기 종료)
+
+        재시도 루프에서는 실패가 흔하므로 O(1) 길이 검사 → FFT 기반
+        검사 순으로 돌리고 첫 실패에서 나머지를 건너뛴다.
+        """
+        # 검사용 샘플레이트로 정규화 후 공유 STFT를 한 번만 계산 (동일 버퍼면 캐시 적중)
+        audio_data, sample_rate, spectrum = self.filters._prepare_checks(audio_data, sample_rate)
+
+        # 비용 오름차순 정렬: 길이(RMS 한 번) << 고주파/극단 주파수(스펙트럼 집계)
+        checks = [
+            ('duration', '길이 검사', self.filters.check_duration),
+            ('high_frequency', '고주파 노이즈 검사', self.filters.check_high_frequency_noise),
+            ('extreme_frequencies', '극단 주파수 검사', self.filters.check_extreme_frequencies),
+        ]
+
+        results = {}
+        failed = False
+        for name, label, check_fn in checks:
+            if failed:
+                results[name] = {'passed': False, 'score': 0.0,
+                                 'reason': 'Skipped (earlier check failed)'}
+                continue
+
+            result = check_fn(audio_data, sample_rate, spectrum=spectrum)
+            results[name] = result
+            # 지연 포맷팅: DEBUG가 꺼져 있으면 문자열을 만들지 않는다
+            logger.debug("    %s: %s (%s)", label,
+                         '통과' if result['passed'] else '실패', result['reason'])
+            if not result['passed']:
+                failed = True
+
+        results['overall_passed'] = not failed
+        return results
     
     def _save_attempt_file(self, audio_result, quality_result, attempt_count):
-        """시도별 파일 저장"""
+        """시도별 파일 저장
+
+        실패한 시도는 기본적으로 저장하지 않아 재시도 루프에서
+        루드니스 측정 + WAV 인코딩 비용을 아낀다. save_failures=True면
+        루드니스 스캔이 없는 clip 전략으로 저장한다.
+        """
         if quality_result['overall_passed']:
             filename = f"attempt{attempt_count}_pass_FINAL"
+            strategy = "loudness"
         else:
+            if not self.save_failures:
+                return f"attempt{attempt_count}_fail (not saved)"
             filename = f"attempt{attempt_count}_fail"
-        
+            strategy = "clip"
+
+        # 인코딩+쓰기는 I/O 풀에 넘기고 바로 복귀 - wav_tensor는 시도마다
+        # 독립된 호스트 텐서라 다음 생성이 덮어쓸 일이 없다
         file_path = os.path.join(self.output_dir, filename)
-        audio_write(
-            file_path, 
-            audio_result['wav_tensor'], 
-            audio_result['sample_rate'], 
-            strategy="loudness"
-        )
-        
+        self._pending_saves.append(self._io_pool.submit(
+            audio_write,
+            file_path,
+            audio_result['wav_tensor'],
+            audio_result['sample_rate'],
+            strategy=strategy
+        ))
+
         return filename + ".wav"
     
     def _print_failure_reasons(self, quality_result):
-        """실패 이유 출력"""
-        failed_reasons = []
-        for check_name, check_result in quality_result.items():
-            if check_name != 'overall_passed' and not check_result['passed']:
-                failed_reasons.append(f"    - {check_result['reason']}")
-        
-        for reason in failed_reasons:
-            print(reason)
+        """실패 이유 출력 (한 번의 write로)"""
+        failed_reasons = [
+            f"    - {check_result['reason']}"
+            for check_name, check_result in quality_result.items()
+            if check_name != 'overall_passed' and not check_result['passed']]
+
+        if failed_reasons:
+            sys.stdout.write("\n".join(failed_reasons) + "\n")
     
-    def _generate_adaptive_summary(self, attempts, total_time, prompt):
+    @staticmethod
+    def _attempt_rank(attempt):
+        """시도의 양호함 순위: (통과 여부, 통과한 검사 수, 점수 합)"""
+        quality = attempt.get('quality') or {}
+        checks = [r for name, r in quality.items() if name != 'overall_passed']
+        passed_count = sum(r['passed'] for r in checks)
+        score_sum = sum(r.get('score', 0.0) for r in checks)
+        return (attempt.get('passed', False), passed_count, score_sum)
+
+    @classmethod
+    def _select_best_attempt(cls, attempts):
+        """통과한 시도가 있으면 그것을, 없으면 가장 양호한 시도를 선택
+
+        양호함 = 통과한 검사 개수, 동률이면 검사 점수 합이 큰 쪽.
+        """
+        candidates = [a for a in attempts if a.get('success')]
+        if not candidates:
+            return attempts[-1] if attempts else None
+        return max(candidates, key=cls._attempt_rank)
+
+    def _generate_adaptive_summary(self, attempts, total_time, prompt, final_result):
         """적응형 파이프라인 요약 생성"""
         successful_attempts = [a for a in attempts if a['success']]
         passed_attempts = [a for a in successful_attempts if a.get('passed', False)]
@@ -185,41 +370,45 @@ class AdaptiveMusicQualityPipeline:
                         reason = check_result['reason']
                         failure_reasons[reason] = failure_reasons.get(reason, 0) + 1
         
+        passed = bool(final_result and final_result.get('passed', False))
         return {
             'total_attempts': len(attempts),
             'successful_generations': len(successful_attempts),
-            'success_attempt_number': len(attempts),  # 마지막 시도가 성공
+            'passed': passed,
+            'success_attempt_number': final_result['attempt'] if passed else None,
             'total_time': total_time,
             'avg_generation_time': sum(a.get('generation_time', 0) for a in successful_attempts) / len(successful_attempts) if successful_attempts else 0,
             'failure_reasons': failure_reasons,
-            'final_filename': attempts[-1]['filename'] if attempts else None
+            'final_filename': final_result.get('filename') if final_result else None
         }
     
     def _print_adaptive_report(self, pipeline_result):
-        """적응형 파이프라인 리포트 출력"""
+        """적응형 파이프라인 리포트 출력 (조립 후 한 번에 출력)"""
         summary = pipeline_result['summary']
-        
-        print(f"\n{'='*60}")
-        print(f"최종 결과 리포트")
-        print(f"{'='*60}")
-        print(f"성공: {summary['success_attempt_number']}번째 시도에서 품질 기준 통과")
-        print(f"총 소요 시간: {summary['total_time']:.1f}초")
-        print(f"최종 파일: {summary['final_filename']}")
-        
+
+        parts = [f"\n{_BAR60}", f"최종 결과 리포트", _BAR60]
+        if summary['passed']:
+            parts.append(f"성공: {summary['success_attempt_number']}번째 시도에서 품질 기준 통과")
+        else:
+            parts.append(f"실패: {summary['total_attempts']}회 시도에서 품질 기준 미통과 (가장 양호한 시도 반환)")
+        parts.append(f"총 소요 시간: {summary['total_time']:.1f}초")
+        parts.append(f"최종 파일: {summary['final_filename']}")
+
         # 시도별 상세 결과
-        print(f"\n시도별 상세 결과:")
+        parts.append(f"\n시도별 상세 결과:")
         for attempt in pipeline_result['attempts']:
             if not attempt['success']:
-                print(f"  시도 {attempt['attempt']}: 생성 실패 ({attempt['error']})")
+                parts.append(f"  시도 {attempt['attempt']}: 생성 실패 ({attempt['error']})")
             elif attempt.get('passed', False):
-                print(f"  시도 {attempt['attempt']}: 성공 ({attempt['generation_time']:.1f}초)")
+                parts.append(f"  시도 {attempt['attempt']}: 성공 ({attempt['generation_time']:.1f}초)")
             else:
-                print(f"  시도 {attempt['attempt']}: 실패 ({attempt['generation_time']:.1f}초)")
-        
+                parts.append(f"  시도 {attempt['attempt']}: 실패 ({attempt['generation_time']:.1f}초)")
+
         # 실패 원인 통계
         if summary['failure_reasons']:
-            print(f"\n실패 원인 통계:")
-            for reason, count in summary['failure_reasons'].items():
-                print(f"  - {reason}: {count}회")
-        
-        print(f"{'='*60}")
\ No newline at end of file
+            parts.append(f"\n실패 원인 통계:")
+            parts.extend(f"  - {reason}: {count}회"
+                         for reason, count in summary['failure_reasons'].items())
+
+        parts.append(_BAR60)
+        print("\n".join(parts))
\ No newline at end of file
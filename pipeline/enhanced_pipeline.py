@@ -0,0 +1,329 @@
+import functools
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from filters.audio_filters import AudioQualityFilters
+from filters.semantic_filters import SemanticMatchingFilters
+
+# 선택 의존성: numba - 점수/상태 스칼라 계산을 네이티브로 컴파일
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# 단계별 가중치 (2단계 / 의미 검사 포함 3단계)와 상태 임계값
+# 모듈 상수여야 numba 커널에 컴파일 시점 상수로 박힌다
+_BASIC_W, _MUSICAL_W = 0.3, 0.7
+_BASIC_W3, _MUSICAL_W3, _SEMANTIC_W3 = 0.2, 0.5, 0.3
+_EXCELLENT_T, _GOOD_T = 0.8, 0.65
+
+# 상태 코드 ↔ 문자열 (0=RETRY, 1=GOOD, 2=EXCELLENT)
+_STATUS_NAMES = ('RETRY', 'GOOD', 'EXCELLENT')
+
+# 상세 리포트 고정 골격 - 구조가 고정이라 매번 리스트를 쌓지 않고
+# 템플릿 하나를 채운다
+_REPORT_HEADER_TMPL = (
+    "=" * 60 + "\n"
+    "품질 평가 상세 리포트\n"
+    + "=" * 60 + "\n"
+    "최종 상태: {status}\n"
+    "종합 점수: {total_score:.3f}\n"
+    "평가 시간: {eval_time:.1f}초"
+)
+_REPORT_CHECK_LINE = "  - {name}: {mark} ({reason})"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_basic_filters():
+    """프로세스 전체에서 공유하는 기본/음악성 필터 인스턴스"""
+    return AudioQualityFilters()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_semantic_filters():
+    """프로세스 전체에서 공유하는 의미 검사 필터 (임베딩 캐시 공유)"""
+    return SemanticMatchingFilters()
+
+if njit is not None:
+    @njit(cache=True)
+    def _score_status_kernel(basic_passed, musical_passed, musical_avg,
+                             semantic_score, has_semantic):
+        """가중 합산 + 임계값 분기를 네이티브 코드 한 호출로 계산"""
+        if not basic_passed:
+            return 0.0, 0
+        if has_semantic:
+            total = (_BASIC_W3 + musical_avg * _MUSICAL_W3
+                     + semantic_score * _SEMANTIC_W3)
+        else:
+            total = _BASIC_W + musical_avg * _MUSICAL_W
+        if total >= _EXCELLENT_T and musical_passed:
+            return total, 2
+        if total >= _GOOD_T:
+            return total, 1
+        return total, 0
+
+    # 임포트 시 워밍업으로 JIT 비용 선불
+    _score_status_kernel(True, True, 0.5, 0.5, True)
+else:
+    _score_status_kernel = None
+
+
+class EnhancedQualityPipeline:
+    """2단계 품질 평가 파이프라인 (기본 검사 → 음악적 완성도 → 의미 일치)
+
+    생성 루프와 분리된 평가 전용 파이프라인. 곡마다 기본 필터와
+    음악성 필터를 돌리고, 프롬프트가 주어지면 CLAP 의미 일치 점수까지
+    합산해 EXCELLENT/GOOD/RETRY 상태를 매긴다.
+    """
+
+    def __init__(self, verbose=False):
+        # 운영 기본은 조용히 - 진행 로그는 verbose=True일 때만 출력
+        self.verbose = verbose
+        # 필터는 모듈 공유 싱글턴에 바인딩 - 파이프라인을 다시 만들어도
+        # 임베딩 캐시/모델 로드 상태가 유지된다
+        self.basic_filters = _get_basic_filters()
+        # 음악성 검사도 같은 필터 클래스에 있으므로 인스턴스를 공유
+        self.musical_filters = self.basic_filters
+        self.semantic_filters = _get_semantic_filters()
+
+    def evaluate_single_music(self, audio_data, sample_rate, prompt=None):
+        """곡 하나를 단계별로 평가하고 종합 결과를 반환
+
+        1단계는 거의 통과하도록 튜닝돼 있으므로 2/3단계를 기다리지 않고
+        투기적으로 같이 시작한다. 1단계가 실패하면 뒷단계 결과는 버린다.
+        (체감 지연은 단계 합이 아니라 가장 긴 단계 하나로 줄어든다.)
+
+        곡 단위 예외 처리는 evaluate_batch 쪽 바깥 핸들러가 맡는다 -
+        여기서는 결과 형태만 명시적 가드로 검증한다.
+        """
+        start_time = time.perf_counter()
+
+        # 파이프라인 경계에서 한 번만 C-연속 float32로 정규화 - 이후
+        # 단계들의 librosa/scipy 호출이 숨은 복사/캐스트 없이 같은
+        # 버퍼를 공유한다 (id 기반 스펙트럼 캐시도 세 단계에서 적중)
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+        assert audio_data.ndim == 1, "audio_data must be a mono 1-D array"
+
+        # 1/2단계가 같은 버퍼를 동시에 검사하므로 공유 스펙트럼을 먼저
+        # 채워 둔다 - 안 하면 두 스레드가 각자 미스를 보고 두 번 계산한다
+        # (evaluate_batch가 이미 프라이밍했으면 멤버십 확인만 하고 끝)
+        self.basic_filters.prime_spectrum_cache([(audio_data, sample_rate)])
+
+        if self.verbose:
+            print(f"  품질 검사 시작 (1단계 + 투기적 2/3단계)...")
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            # 1단계는 탈락 게이트로만 쓰이므로 첫 실패에서 바로 끊는다
+            f_basic = ex.submit(self.basic_filters.run_all_checks,
+                                audio_data, sample_rate, fast_fail=True)
+            f_musical = ex.submit(self.musical_filters.run_musical_checks,
+                                  audio_data, sample_rate)
+            f_semantic = None
+            if prompt is not None:
+                f_semantic = ex.submit(self.semantic_filters.check_prompt_alignment,
+                                       audio_data, sample_rate, prompt)
+
+            basic_result = f_basic.result()
+            if not basic_result.get('overall_passed', False):
+                # 이미 도는 투기 작업은 취소 시도 후 결과만 버린다
+                f_musical.cancel()
+                if f_semantic is not None:
+                    f_semantic.cancel()
+                if self.verbose:
+                    print(f"  1단계 탈락 - 음악성/의미 검사 결과 폐기")
+                return {
+                    'status': 'RETRY',
+                    'total_score': 0.0,
+                    'basic_result': basic_result,
+                    'musical_result': None,
+                    'semantic_result': None,
+                    'eval_time': time.perf_counter() - start_time
+                }
+
+            musical_result = f_musical.result()
+            semantic_result = (f_semantic.result()
+                               if f_semantic is not None else None)
+
+        # 필터 결과 형태 검증 (except KeyError 대신 가드 하나)
+        if 'overall_passed' not in musical_result:
+            return {
+                'status': 'RETRY',
+                'total_score': 0.0,
+                'basic_result': basic_result,
+                'musical_result': musical_result,
+                'semantic_result': semantic_result,
+                'error': 'malformed musical filter result',
+                'eval_time': time.perf_counter() - start_time
+            }
+
+        total_score, status = self._score_and_status(
+            basic_result, musical_result, semantic_result)
+
+        return {
+            'status': status,
+            'total_score': total_score,
+            'basic_result': basic_result,
+            'musical_result': musical_result,
+            'semantic_result': semantic_result,
+            'eval_time': time.perf_counter() - start_time
+        }
+
+    def evaluate_batch(self, music_data_list, prompts=None):
+        """여러 곡을 병렬로 평가
+
+        곡별 평가는 서로 독립이고 필터 내부의 librosa/scipy가 FFT
+        구간에서 GIL을 풀기 때문에 스레드 풀로 겹쳐 돌린다. (CLAP 등
+        모델을 쥔 필터 객체는 프로세스 간 직렬화가 안 되므로 프로세스
+        풀 대신 스레드 풀을 쓴다.) map이 입력 순서를 보존한다.
+        """
+        # 빈 리스트도 None과 동일하게 취급 (아래 패딩이 prompts[0]을 참조)
+        if not prompts:
+            prompts = [None]
+
+        # 프롬프트 목록을 루프 전에 곡 수에 맞춰 정규화 (곡마다 범위
+        # 검사 분기를 없앰 - 모자라면 첫 프롬프트로 채움)
+        if len(prompts) < len(music_data_list):
+            prompts = list(prompts) + [prompts[0]] * (len(music_data_list) - len(prompts))
+
+        if self.verbose:
+            print(f"\n품질 평가 시작: {len(music_data_list)}곡")
+        start_time = time.perf_counter()
+
+        # 워커들이 돌기 전에 배치 전체의 공유 스펙트럼을 STFT 한 번으로
+        # 선계산 - 캐시 상한도 배치 크기로 맞춰져 곡들이 서로 밀어내지 않는다
+        self.basic_filters.prime_spectrum_cache(music_data_list)
+
+        def evaluate_one(args):
+            i, (audio_data, sample_rate), prompt = args
+            # 배치 전체를 덮는 단일 광역 핸들러 - 문제 곡만 RETRY로 태깅
+            try:
+                result = self.evaluate_single_music(audio_data, sample_rate, prompt)
+            except Exception as e:
+                result = {
+                    'status': 'RETRY',
+                    'total_score': 0.0,
+                    'basic_result': None,
+                    'musical_result': None,
+                    'semantic_result': None,
+                    'error': str(e),
+                    'eval_time': 0.0
+                }
+            result['index'] = i + 1
+            return result
+
+        # 빈 배치여도 요약은 정상 반환해야 하므로 워커 수를 1로 클램프
+        max_workers = max(1, min(len(music_data_list), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            results = list(ex.map(
+                evaluate_one,
+                ((i, data, prompt) for i, (data, prompt)
+                 in enumerate(zip(music_data_list, prompts)))))
+
+        # 요약 집계 - 상태는 한 패스 Counter로, 평균은 numpy 벡터 연산으로
+        counts = Counter(r['status'] for r in results)
+        excellent_count = counts.get('EXCELLENT', 0)
+        good_count = counts.get('GOOD', 0)
+        retry_count = counts.get('RETRY', 0)
+        avg_score = (float(np.fromiter((r['total_score'] for r in results),
+                                       dtype=np.float32, count=len(results)).mean())
+                     if results else 0.0)
+
+        summary = {
+            'total_count': len(results),
+            'excellent_count': excellent_count,
+            'good_count': good_count,
+            'retry_count': retry_count,
+            'avg_score': avg_score,
+            'total_time': time.perf_counter() - start_time
+        }
+
+        if self.verbose:
+            print(f"평가 완료: EXCELLENT {excellent_count} / GOOD {good_count} "
+                  f"/ RETRY {retry_count} (평균 {avg_score:.3f})")
+
+        return {'results': results, 'summary': summary}
+
+    # 모듈 상수 노출 (하위 호환/가독성용)
+    BASIC_W, MUSICAL_W = _BASIC_W, _MUSICAL_W
+    BASIC_W3, MUSICAL_W3, SEMANTIC_W3 = _BASIC_W3, _MUSICAL_W3, _SEMANTIC_W3
+    EXCELLENT_THRESHOLD, GOOD_THRESHOLD = _EXCELLENT_T, _GOOD_T
+
+    def _score_and_status(self, basic_result, musical_result, semantic_result=None):
+        """종합 점수와 상태를 한 패스로 계산
+
+        예전의 _calculate_total_score/_determine_status를 융합한 형태 -
+        딕셔너리 키는 각각 한 번만 읽고 로컬 변수로 계산한다. 기본
+        검사는 점수보다 통과 여부가 의미라 이진 점수로 취급한다.
+        순수 스칼라 산술은 numba 커널로 컴파일돼 있으면 그쪽을 쓴다.
+        """
+        basic_passed = basic_result['overall_passed']
+        musical_checks = [r for name, r in musical_result.items()
+                          if name != 'overall_passed']
+        musical_avg = (sum(min(max(r['score'], 0.0), 1.0) for r in musical_checks)
+                       / len(musical_checks) if musical_checks else 0.0)
+        musical_passed = musical_result['overall_passed']
+        has_semantic = semantic_result is not None
+        semantic_score = (min(max(semantic_result['score'], 0.0), 1.0)
+                          if has_semantic else 0.0)
+
+        if _score_status_kernel is not None:
+            total_score, code = _score_status_kernel(
+                basic_passed, musical_passed, musical_avg,
+                semantic_score, has_semantic)
+            return total_score, _STATUS_NAMES[code]
+
+        if not basic_passed:
+            return 0.0, 'RETRY'
+        if has_semantic:
+            total_score = (_BASIC_W3 + musical_avg * _MUSICAL_W3
+                           + semantic_score * _SEMANTIC_W3)
+        else:
+            total_score = _BASIC_W + musical_avg * _MUSICAL_W
+
+        if total_score >= _EXCELLENT_T and musical_passed:
+            return total_score, 'EXCELLENT'
+        if total_score >= _GOOD_T:
+            return total_score, 'GOOD'
+        return total_score, 'RETRY'
+
+    @staticmethod
+    def _format_check_section(title, checks):
+        """검사 딕셔너리 하나를 섹션 문자열로 변환 (한 번의 join)"""
+        lines = "\n".join(
+            _REPORT_CHECK_LINE.format(
+                name=name,
+                mark="통과" if check['passed'] else "실패",
+                reason=check['reason'])
+            for name, check in checks.items() if name != 'overall_passed')
+        return f"\n\n{title}\n{lines}"
+
+    def generate_detailed_report(self, evaluation_result):
+        """평가 결과를 사람이 읽을 수 있는 리포트 문자열로 변환
+
+        고정 골격은 모듈 상수 템플릿 하나를 format_map으로 채우고,
+        가변 길이 섹션만 조건부로 덧붙인다 (리스트 누적 + join 대신
+        문자열 연결 몇 번).
+        """
+        report = _REPORT_HEADER_TMPL.format_map(evaluation_result)
+
+        basic_result = evaluation_result.get('basic_result')
+        if basic_result:
+            report += self._format_check_section("[1단계] 기본 품질 검사", basic_result)
+
+        musical_result = evaluation_result.get('musical_result')
+        if musical_result:
+            report += self._format_check_section("[2단계] 음악적 완성도 검사", musical_result)
+
+        semantic_result = evaluation_result.get('semantic_result')
+        if semantic_result:
+            report += self._format_check_section(
+                "[3단계] 프롬프트 의미 일치 검사", {'alignment': semantic_result})
+
+        error = evaluation_result.get('error')
+        if error:
+            report += f"\n\n오류: {error}"
+
+        return report + "\n" + "=" * 60
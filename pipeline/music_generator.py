@@ -1,21 +1,105 @@
+import functools
+import os
+import tempfile
 import torch
 import numpy as np
 import time
 from audiocraft.models import MusicGen
 
+# 느린 NFS 홈 디렉토리 환경에서는 MUSICGEN_HF_CACHE로 HF 캐시를 로컬
+# SSD/램디스크로 옮길 수 있다 (이미 HF_HUB_CACHE가 있으면 존중)
+_local_cache = os.environ.get('MUSICGEN_HF_CACHE')
+if _local_cache:
+    os.environ.setdefault('HF_HUB_CACHE', _local_cache)
+
+# 디바이스는 프로세스 수명 동안 변하지 않으므로 임포트 시 한 번만 결정
+_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@functools.lru_cache(maxsize=2)
+def _load_musicgen(model_name):
+    """모델 가중치 로드를 프로세스 전체에서 공유 (이름당 1회)
+
+    파이프라인 객체를 다시 만들어도 ~수 GB 가중치를 디스크에서 다시
+    읽지 않는다.
+    """
+    print(f"🎵 MusicGen 모델 로딩 중... (디바이스: {_DEVICE})")
+    model = MusicGen.get_pretrained(model_name)
+
+    # 자기회귀 디코딩 루프는 토큰당 작은 커널 다발이라 런치 오버헤드가
+    # 지배적 - compile로 융합해 파이썬 디스패치를 없앤다 (실패 시 eager)
+    if _DEVICE == "cuda" and hasattr(torch, 'compile'):
+        try:
+            model.lm = torch.compile(model.lm, mode='reduce-overhead',
+                                     fullgraph=False)
+        except Exception as e:
+            print(f"⚠️ torch.compile 실패 - eager로 진행: {e}")
+
+    print("✅ MusicGen 모델 로딩 완료!")
+    return model
+
+
+@functools.lru_cache(maxsize=None)
+def get_music_generator(model_name='facebook/musicgen-small', duration=12.0):
+    """같은 설정의 MusicGenerator를 프로세스 전체에서 공유
+
+    가중치는 _load_musicgen이 이미 공유하지만, 래퍼 인스턴스도 공유하면
+    피닝 스테이징 버퍼와 워밍업 상태까지 파이프라인들이 같이 쓴다.
+    """
+    return MusicGenerator(model_name=model_name, duration=duration)
+
 
 class MusicGenerator:
     """audiocraft MusicGen 래퍼 클래스"""
-    
+
+    @classmethod
+    def prewarm(cls, model_name='facebook/musicgen-small'):
+        """가중치를 미리 로드해 첫 요청의 콜드 로드를 제거
+
+        여러 워커가 같은 HF 캐시를 동시에 채우지 않도록 파일 락으로
+        직렬화한다 (락을 못 쓰는 플랫폼에서는 그냥 로드).
+        """
+        lock_path = os.path.join(
+            tempfile.gettempdir(),
+            f"musicgen_prewarm_{model_name.replace('/', '_')}.lock")
+        with open(lock_path, 'w') as lock_file:
+            try:
+                import fcntl
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except (ImportError, OSError):
+                pass
+            _load_musicgen(model_name)
+
     def __init__(self, model_name='facebook/musicgen-small', duration=12.0):
         self.model_name = model_name
         self.duration = duration
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        print(f"🎵 MusicGen 모델 로딩 중... (디바이스: {self.device})")
-        self.model = MusicGen.get_pretrained(model_name)
-        
+        self.device = _DEVICE
+
+        self.model = _load_musicgen(model_name)
+
+        # CUDA에서는 혼합 정밀도로 생성 (Ampere+면 BF16, 아니면 FP16)
+        # 출력은 float32로 되돌려 필터 정확도를 유지한다
+        if self.device == "cuda":
+            self.autocast_dtype = (torch.bfloat16 if torch.cuda.is_bf16_supported()
+                                   else torch.float16)
+        else:
+            self.autocast_dtype = None
+
+        # D→H 복사용 피닝(페이지 고정) 스테이징 버퍼 - 필요해지면 할당
+        self._pinned = None
+
         # generation_params 설정 (temperature=1.0 고정)
+        self._set_generation_params(duration)
+
+    def _set_generation_params(self, duration):
+        """생성 파라미터 설정 - 모델에 이미 적용된 값이면 호출 생략
+
+        모델 객체는 인스턴스 간에 공유되므로 마지막 적용 값도 모델에
+        붙여서 기억한다.
+        """
+        params = (True, 1.0, duration, 250, 0.0, 3.0)
+        if getattr(self.model, '_applied_gen_params', None) == params:
+            return
         self.model.set_generation_params(
             use_sampling=True,
             temperature=1.0,  # 고정
@@ -24,28 +108,73 @@ class MusicGenerator:
             top_p=0.0,  # top_k만 사용
             cfg_coef=3.0
         )
-        print("✅ MusicGen 모델 로딩 완료!")
-        
+        self.model._applied_gen_params = params
+
+    def _generate(self, prompts, duration=None):
+        """생성 forward 실행 - CUDA에서는 autocast 혼합 정밀도 사용"""
+        # 모델은 인스턴스 간 공유라 다른 duration의 래퍼가 파라미터를
+        # 바꿨을 수 있다 - 매 호출 재적용 (이미 적용된 값이면 no-op)
+        self._set_generation_params(self.duration if duration is None else duration)
+        if self.autocast_dtype is not None:
+            with torch.inference_mode(), \
+                    torch.autocast('cuda', dtype=self.autocast_dtype):
+                wav = self.model.generate(prompts, progress=False)
+            return wav.float()
+        with torch.inference_mode():
+            return self.model.generate(prompts, progress=False)
+
+    def _to_cpu(self, wav):
+        """생성 텐서를 피닝 버퍼 경유 비동기 복사로 호스트에 내림
+
+        피닝 메모리는 DMA 직접 전송이 가능해 페이저블 복사보다 빠르고
+        non_blocking 복사로 GPU 스트림을 덜 세운다. 스테이징 버퍼는
+        재사용되므로 호출자에게는 host 쪽 복사본을 돌려 별칭 문제가
+        없게 한다.
+        """
+        if self.device != "cuda":
+            return wav.detach().cpu()
+
+        flat = wav.detach().reshape(-1)
+        n = flat.numel()
+        if self._pinned is None or self._pinned.numel() < n:
+            self._pinned = torch.empty(n, dtype=flat.dtype, pin_memory=True)
+        staging = self._pinned[:n]
+        staging.copy_(flat, non_blocking=True)
+        torch.cuda.current_stream().synchronize()
+        return staging.clone().reshape(wav.shape)
+
+    def warmup(self):
+        """1초짜리 더미 생성으로 cuDNN 자동 튜닝/커널 캐시를 미리 채움
+
+        첫 실제 프롬프트가 콜드 스타트 비용을 내지 않도록 한다.
+        """
+        try:
+            self._generate(["warmup"], duration=1.0)
+        except Exception as e:
+            print(f"⚠️ MusicGen 워밍업 실패 (무시): {e}")
+
     def generate_single(self, prompt):
         """프롬프트로 음악 1개 생성"""
         try:
-            start_time = time.time()
-            
+            # 벽시계(time.time)는 NTP 보정에 흔들리므로 단조 시계로 잰다
+            start_ns = time.monotonic_ns()
+
             # 음악 생성
-            wav = self.model.generate([prompt], progress=False)
+            wav = self._generate([prompt])
             
-            # numpy 배열로 변환 (품질 검사용)
-            audio_data = wav[0].cpu().numpy().squeeze()
+            # 호스트로 한 번만 내리고 numpy 뷰와 저장용 텐서가 메모리를 공유
+            cpu_wav = self._to_cpu(wav[0])
+            audio_data = cpu_wav.numpy().squeeze()
             sample_rate = self.model.sample_rate
             duration = len(audio_data) / sample_rate
-            generation_time = time.time() - start_time
-            
+            generation_time = (time.monotonic_ns() - start_ns) / 1e9
+
             return {
                 'success': True,
                 'audio_data': audio_data,    # numpy array for analysis
                 'sample_rate': sample_rate,
                 'duration': duration,
-                'wav_tensor': wav[0].cpu(),  # torch tensor for saving
+                'wav_tensor': cpu_wav,       # torch tensor for saving
                 'prompt': prompt,
                 'generation_time': generation_time
             }
@@ -58,21 +187,61 @@ class MusicGenerator:
             }
         
     def generate_batch(self, prompt, count=5):
-        """같은 프롬프트로 여러 개 생성"""
-        results = []
-        
-        print(f"🎼 '{prompt}' - {count}개 생성 시작...")
-        
-        for i in range(count):
-            print(f"  생성 {i+1}/{count}...", end=" ")
-            
-            result = self.generate_single(prompt)
-            
-            if result['success']:
-                print(f"완료 ({result['generation_time']:.1f}초)")
-            else:
-                print(f"실패: {result['error']}")
-            
-            results.append(result)
-            
-        return results
\ No newline at end of file
+        """같은 프롬프트로 여러 개를 한 번의 배치 forward로 생성
+
+        count번 따로 호출하는 대신 프롬프트를 count개로 복제해 MusicGen
+        배치 차원으로 넘긴다. KV 캐시 준비 같은 1회성 비용이 배치
+        전체에 분할 상환되어 GPU 활용률이 훨씬 좋다.
+        """
+        print(f"🎼 '{prompt}' - {count}개 배치 생성 시작...")
+        return self._generate_grouped([prompt], count)[0]
+
+    def generate_multi(self, prompts, count=5):
+        """프롬프트 여러 개를 각각 count곡씩 한 번의 배치 forward로 생성
+
+        len(prompts) × count개의 description을 한 배치로 넘겨 텍스트
+        인코딩과 디코딩 launch 비용을 전체에 분할 상환하고, 결과를
+        프롬프트별 리스트로 되돌린다.
+        """
+        print(f"🎼 프롬프트 {len(prompts)}개 × {count}곡 배치 생성 시작...")
+        return self._generate_grouped(list(prompts), count)
+
+    def _generate_grouped(self, prompts, count):
+        """prompts를 count개씩 복제한 한 번의 forward 후 프롬프트별로 분할"""
+        total = len(prompts) * count
+        try:
+            start_ns = time.monotonic_ns()
+            wavs = self._generate([p for p in prompts for _ in range(count)])
+
+            # (total, 1, T) 텐서를 피닝 버퍼 경유로 한 번만 옮기고 일괄 변환
+            cpu_wavs = self._to_cpu(wavs)
+            wavs_np = cpu_wavs.numpy().squeeze(1)
+
+            generation_time = (time.monotonic_ns() - start_ns) / 1e9
+            per_item_time = generation_time / total
+            sample_rate = self.model.sample_rate
+
+            grouped = []
+            for k, prompt in enumerate(prompts):
+                results = []
+                for i in range(k * count, (k + 1) * count):
+                    audio_data = wavs_np[i]
+                    results.append({
+                        'success': True,
+                        'audio_data': audio_data,    # numpy array for analysis
+                        'sample_rate': sample_rate,
+                        'duration': len(audio_data) / sample_rate,
+                        'wav_tensor': cpu_wavs[i],   # torch tensor for saving
+                        'prompt': prompt,
+                        'generation_time': per_item_time
+                    })
+                grouped.append(results)
+
+            print(f"  완료: {total}개 / {generation_time:.1f}초 (곡당 {per_item_time:.1f}초)")
+            return grouped
+
+        except Exception as e:
+            print(f"  실패: {e}")
+            return [[{'success': False, 'error': str(e), 'prompt': prompt}
+                     for _ in range(count)]
+                    for prompt in prompts]
\ No newline at end of file
@@ -1,37 +1,55 @@
 import os
+import sys
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from audiocraft.data.audio import audio_write
-from .music_generator import MusicGenerator
+from .music_generator import get_music_generator
 from filters.audio_filters import AudioQualityFilters
 
+# 리포트 배너는 매번 '='*60으로 새로 만들지 않고 상수로 재사용
+_BAR60 = "=" * 60
+
 
 class MusicQualityPipeline:
     """메인 파이프라인 클래스"""
     
     def __init__(self, output_dir="output"):
         self.output_dir = output_dir
-        self.generator = MusicGenerator()
+        # 파이프라인 여러 개가 한 프로세스에 공존해도 생성기는 하나만
+        self.generator = get_music_generator()
         self.filters = AudioQualityFilters()
         
         # 출력 디렉토리 생성
         os.makedirs(output_dir, exist_ok=True)
         
-    def process_prompt(self, prompt, batch_size=5):
-        """프롬프트 처리 메인 함수"""
-        start_time = time.time()
-        
+    def process_prompt(self, prompt, batch_size=5, generation_results=None):
+        """프롬프트 처리 메인 함수
+
+        generation_results가 주어지면 (process_prompts의 배치 생성분)
+        생성 단계를 건너뛰고 검사/저장/리포트만 수행한다.
+        """
+        t0 = time.perf_counter_ns()
+
         # 1. batch_size만큼 음악 생성
-        generation_results = self.generator.generate_batch(prompt, batch_size)
-        
-        # 2. 각각 품질 검사 및 저장
-        results = []
+        if generation_results is None:
+            generation_results = self.generator.generate_batch(prompt, batch_size)
         
+        # 2. 품질 검사 + 저장을 워커 스레드에서 겹쳐 실행
+        #    (librosa/scipy는 FFT 구간에서, audio_write는 파일 I/O에서
+        #    GIL을 풀기 때문에 곡별 검사/저장이 서로 겹친다)
         print(f"\n🔍 품질 검사 및 파일 저장...")
-        
-        for i, gen_result in enumerate(generation_results, 1):
+
+        # 배치 전체의 공유 스펙트럼을 STFT 한 번으로 선계산해 두면
+        # 각 워커의 run_all_checks가 캐시에 바로 적중한다
+        self.filters.prime_spectrum_cache(
+            [(r['audio_data'], r['sample_rate'])
+             for r in generation_results if r['success']])
+
+        def check_and_save(args):
+            i, gen_result = args
             if not gen_result['success']:
-                # 생성 실패한 경우
-                result = {
+                return {
                     'index': i,
                     'passed': False,
                     'filename': None,
@@ -39,43 +57,51 @@ class MusicQualityPipeline:
                     'generation_time': 0,
                     'error': gen_result['error']
                 }
-                print(f"  샘플 {i}: ❌ 생성 실패 ({gen_result['error']})")
+
+            # 3. 품질 검사
+            quality_result = self.filters.run_all_checks(
+                gen_result['audio_data'],
+                gen_result['sample_rate']
+            )
+
+            # 4. 파일 저장
+            filename = self._save_audio_with_result(
+                gen_result, quality_result, i, prompt
+            )
+
+            return {
+                'index': i,
+                'passed': quality_result['overall_passed'],
+                'filename': filename,
+                'quality': quality_result,
+                'generation_time': gen_result['generation_time']
+            }
+
+        # 빈 생성 결과여도 리포트까지는 정상 진행하도록 1로 클램프
+        max_workers = max(1, min(len(generation_results), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            results = list(ex.map(check_and_save,
+                                  enumerate(generation_results, 1)))
+
+        # 결과 출력은 순서대로 모아서 한 번의 write로 (워커 출력이 섞이지
+        # 않게 + 샘플당 write 시스템콜 여러 번 → 전체 한 번)
+        lines = []
+        for result in results:
+            i = result['index']
+            if result['quality'] is None:
+                lines.append(f"  샘플 {i}: ❌ 생성 실패 ({result['error']})")
+            elif result['passed']:
+                lines.append(f"  샘플 {i}: ✅ 통과 → {result['filename']}")
             else:
-                # 3. 품질 검사
-                quality_result = self.filters.run_all_checks(
-                    gen_result['audio_data'], 
-                    gen_result['sample_rate']
-                )
-                
-                # 4. 파일 저장
-                filename = self._save_audio_with_result(
-                    gen_result, quality_result, i, prompt
-                )
-                
-                result = {
-                    'index': i,
-                    'passed': quality_result['overall_passed'],
-                    'filename': filename,
-                    'quality': quality_result,
-                    'generation_time': gen_result['generation_time']
-                }
-                
-                # 결과 출력
-                if quality_result['overall_passed']:
-                    print(f"  샘플 {i}: ✅ 통과 → {filename}")
-                else:
-                    failed_reasons = []
-                    for check_name, check_result in quality_result.items():
-                        if check_name != 'overall_passed' and not check_result['passed']:
-                            failed_reasons.append(check_result['reason'])
-                    print(f"  샘플 {i}: ❌ 실패 → {filename}")
-                    for reason in failed_reasons:
-                        print(f"    - {reason}")
-            
-            results.append(result)
+                lines.append(f"  샘플 {i}: ❌ 실패 → {result['filename']}")
+                lines.extend(
+                    f"    - {check_result['reason']}"
+                    for check_name, check_result in result['quality'].items()
+                    if check_name != 'overall_passed' and not check_result['passed'])
+        sys.stdout.write("\n".join(lines) + "\n")
         
         # 5. 결과 리포트 생성
-        total_time = time.time() - start_time
+        total_time = (time.perf_counter_ns() - t0) / 1e9
         summary = self._generate_summary(results, total_time)
         
         pipeline_result = {
@@ -89,44 +115,67 @@ class MusicQualityPipeline:
         self._print_report(pipeline_result)
         
         return pipeline_result
-        
+
+    def process_prompts(self, prompts, batch_size=5):
+        """여러 프롬프트를 한 번의 배치 forward로 생성 후 프롬프트별로 처리
+
+        파이프된 입력처럼 프롬프트가 미리 모여 있을 때 쓴다 - 생성은
+        len(prompts) × batch_size 한 배치로 묶고, 검사/저장/리포트는
+        기존 process_prompt 경로를 그대로 탄다.
+        """
+        grouped = self.generator.generate_multi(prompts, batch_size)
+        return [self.process_prompt(prompt, batch_size, generation_results=results)
+                for prompt, results in zip(prompts, grouped)]
+
     def _save_audio_with_result(self, audio_result, quality_result, index, prompt):
-        """품질 검사 결과에 따라 파일 저장"""
-        # 파일명 결정
+        """품질 검사 결과에 따라 파일 저장
+
+        루드니스 측정(BS.1770 게이팅 스캔)은 곡당 한 번의 전체 패스라
+        비싸다 - 통과한 곡에만 적용하고, 검수용으로만 남는 실패 곡은
+        스캔이 없는 clip 전략으로 저장한다.
+        """
+        # 파일명/저장 전략 결정
         if quality_result['overall_passed']:
             filename = f"sample{index}_pass"
+            strategy = "loudness"
         else:
             filename = f"sample{index}_fail"
-        
+            strategy = "clip"
+
         # 파일 저장
         file_path = os.path.join(self.output_dir, filename)
         audio_write(
-            file_path, 
-            audio_result['wav_tensor'], 
-            audio_result['sample_rate'], 
-            strategy="loudness"
+            file_path,
+            audio_result['wav_tensor'],
+            audio_result['sample_rate'],
+            strategy=strategy
         )
-        
+
         return filename + ".wav"
         
     def _generate_summary(self, results, total_time):
-        """결과 요약 생성"""
-        success_count = sum(1 for r in results if r['passed'])
+        """결과 요약 생성 (results를 한 번만 순회)"""
+        success_count = 0
+        passed_files, failed_files = [], []
+        failure_reasons = Counter()
+
+        for result in results:
+            if result['passed']:
+                success_count += 1
+                if result['filename']:
+                    passed_files.append(result['filename'])
+            else:
+                if result['filename']:
+                    failed_files.append(result['filename'])
+                if result['quality']:
+                    failure_reasons.update(
+                        check_result['reason']
+                        for check_name, check_result in result['quality'].items()
+                        if check_name != 'overall_passed' and not check_result['passed'])
+
         fail_count = len(results) - success_count
         success_rate = success_count / len(results) if results else 0
-        
-        passed_files = [r['filename'] for r in results if r['passed'] and r['filename']]
-        failed_files = [r['filename'] for r in results if not r['passed'] and r['filename']]
-        
-        # 실패 원인 통계
-        failure_reasons = {}
-        for result in results:
-            if not result['passed'] and result['quality']:
-                for check_name, check_result in result['quality'].items():
-                    if check_name != 'overall_passed' and not check_result['passed']:
-                        reason = check_result['reason']
-                        failure_reasons[reason] = failure_reasons.get(reason, 0) + 1
-        
+
         return {
             'success_count': success_count,
             'fail_count': fail_count,
@@ -138,29 +187,30 @@ class MusicQualityPipeline:
         }
         
     def _print_report(self, pipeline_result):
-        """결과 리포트 출력"""
+        """결과 리포트 출력 (조립 후 한 번에 출력)"""
         summary = pipeline_result['summary']
-        
-        print(f"\n{'='*60}")
-        print(f"📊 결과 리포트")
-        print(f"{'='*60}")
-        print(f"프롬프트: '{pipeline_result['prompt']}'")
-        print(f"전체 시간: {summary['total_time']:.1f}초")
-        print(f"성공률: {summary['success_count']}/{pipeline_result['batch_size']} ({summary['success_rate']:.1%})")
-        
+
+        parts = [
+            f"\n{_BAR60}",
+            f"📊 결과 리포트",
+            _BAR60,
+            f"프롬프트: '{pipeline_result['prompt']}'",
+            f"전체 시간: {summary['total_time']:.1f}초",
+            f"성공률: {summary['success_count']}/{pipeline_result['batch_size']} ({summary['success_rate']:.1%})",
+        ]
+
         if summary['passed_files']:
-            print(f"\n✅ 통과한 파일 ({len(summary['passed_files'])}개):")
-            for filename in summary['passed_files']:
-                print(f"  - {filename}")
-        
+            parts.append(f"\n✅ 통과한 파일 ({len(summary['passed_files'])}개):")
+            parts.extend(f"  - {filename}" for filename in summary['passed_files'])
+
         if summary['failed_files']:
-            print(f"\n❌ 실패한 파일 ({len(summary['failed_files'])}개):")
-            for filename in summary['failed_files']:
-                print(f"  - {filename}")
-        
+            parts.append(f"\n❌ 실패한 파일 ({len(summary['failed_files'])}개):")
+            parts.extend(f"  - {filename}" for filename in summary['failed_files'])
+
         if summary['failure_reasons']:
-            print(f"\n🔍 실패 원인 통계:")
-            for reason, count in summary['failure_reasons'].items():
-                print(f"  - {reason}: {count}회")
-        
-        print(f"{'='*60}")
\ No newline at end of file
+            parts.append(f"\n🔍 실패 원인 통계:")
+            parts.extend(f"  - {reason}: {count}회"
+                         for reason, count in summary['failure_reasons'].items())
+
+        parts.append(_BAR60)
+        print("\n".join(parts))
\ No newline at end of file
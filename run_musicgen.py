@@ -7,8 +7,24 @@ device = "cuda" if torch.cuda.is_available() else "cpu"
 model = MusicGen.get_pretrained('facebook/musicgen-small')  # <-- 최신 방식 권장
 model.set_generation_params(duration=10)  # 8초짜리 음악 생성
 
+# 자기회귀 디코더를 compile로 융합 (파이프라인 쪽과 같은 설정, 실패 시 eager)
+if device == "cuda" and hasattr(torch, 'compile'):
+    try:
+        model.lm = torch.compile(model.lm, mode='reduce-overhead', fullgraph=False)
+    except Exception as e:
+        print(f"torch.compile 실패 - eager로 진행: {e}")
+
 descriptions = ["Cinderella is dancing her way to the Grand ballroom."]
 
-wav = model.generate(descriptions, progress=True)
+# CUDA에서는 혼합 정밀도로 생성 (Ampere+면 BF16, 아니면 FP16)
+# EnCodec 디코더는 수치에 민감하므로 가중치 자체는 FP32로 둔다
+if device == "cuda":
+    amp_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    with torch.inference_mode(), torch.autocast('cuda', dtype=amp_dtype):
+        wav = model.generate(descriptions, progress=True)
+    wav = wav.float()
+else:
+    with torch.inference_mode():
+        wav = model.generate(descriptions, progress=True)
 
 audio_write("sample1", wav[0].cpu(), model.sample_rate, strategy="loudness")
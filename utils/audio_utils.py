@@ -1,24 +1,58 @@
+import math
 import re
 import os
+from pathlib import Path
+
+import numpy as np
+
+
+class _SafeTable(dict):
+    """create_safe_filename용 지연 translate 테이블
+
+    특수문자는 삭제, 공백/하이픈은 '_' 치환, 단어 문자는 유지.
+    ASCII는 임포트 시 미리 분류해 두고 그 밖의 코드포인트(한글 프롬프트
+    등)는 처음 만날 때 한 번만 분류해 캐시한다.
+    """
+
+    def __missing__(self, code):
+        ch = chr(code)
+        if ch == '-' or ch.isspace():
+            mapped = '_'
+        elif ch == '_' or ch.isalnum():
+            mapped = code  # 유지
+        else:
+            mapped = None  # 삭제
+        self[code] = mapped
+        return mapped
+
+
+_SAFE_TABLE = _SafeTable()
+for _code in range(128):
+    _SAFE_TABLE[_code]
+
+# 연속 구분자 축약용 (단순 리터럴 반복이라 역추적 없음)
+_UNDERSCORE_RUN = re.compile(r'_+')
 
 
 def create_safe_filename(prompt, max_length=50):
-    """프롬프트를 안전한 파일명으로 변환"""
-    # 특수문자 제거 및 공백을 언더스코어로 변경
-    safe_name = re.sub(r'[^\w\s-]', '', prompt)
-    safe_name = re.sub(r'[-\s]+', '_', safe_name)
-    
+    """프롬프트를 안전한 파일명으로 변환
+
+    유니코드 클래스 정규식 두 번 대신 C 레벨 코드포인트 조회
+    (str.translate) 한 번으로 특수문자 삭제와 '_' 치환을 끝낸다.
+    """
+    safe_name = _UNDERSCORE_RUN.sub('_', prompt.translate(_SAFE_TABLE))
+
     # 길이 제한
     if len(safe_name) > max_length:
         safe_name = safe_name[:max_length]
-    
+
     # 앞뒤 언더스코어 제거
     safe_name = safe_name.strip('_')
-    
+
     # 빈 문자열인 경우 기본값
     if not safe_name:
         safe_name = "untitled"
-    
+
     return safe_name.lower()
 
 
@@ -34,15 +68,21 @@ def calculate_success_rate(results):
     if not results:
         return 0.0
     
-    passed_count = sum(1 for r in results if r.get('passed', False))
+    passed_count = sum(r.get('passed', False) for r in results)
     return passed_count / len(results)
 
 
 def ensure_output_directory(output_dir):
-    """출력 디렉토리가 존재하는지 확인하고 생성"""
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    """출력 디렉토리가 존재하는지 확인하고 생성
+
+    exists() 선확인 없이 mkdir 한 번으로 끝낸다 - 이미 있으면
+    FileExistsError를 받으므로 stat 시스템콜이 빠진다.
+    """
+    try:
+        Path(output_dir).mkdir(parents=True)
         print(f"📁 출력 디렉토리 생성: {output_dir}")
+    except FileExistsError:
+        pass
     return output_dir
 
 
@@ -73,15 +113,27 @@ def format_quality_score(score, passed):
 
 
 def get_audio_info_summary(audio_data, sample_rate):
-    """오디오 정보 요약 반환"""
-    duration = len(audio_data) / sample_rate
-    max_amplitude = max(abs(audio_data.max()), abs(audio_data.min()))
-    rms = (audio_data ** 2).mean() ** 0.5
-    
+    """오디오 정보 요약 반환 (N짜리 임시 배열 없이 계산)
+
+    예전에는 max/min/제곱 평균이 버퍼를 세 번 훑고 audio_data**2
+    임시 배열까지 만들었다 - 긴 파형에서는 메모리 대역폭이 지배적이라
+    피크는 양끝 최댓값 비교로, RMS는 BLAS dot 한 번으로 구한다.
+    """
+    a = np.ascontiguousarray(audio_data, dtype=np.float32).ravel()
+    n = a.size
+    duration = n / sample_rate
+
+    if n == 0:
+        max_amplitude = 0.0
+        rms = 0.0
+    else:
+        max_amplitude = float(max(a.max(), -a.min()))
+        rms = math.sqrt(float(a @ a) / n)
+
     return {
         'duration': duration,
         'sample_rate': sample_rate,
         'max_amplitude': max_amplitude,
         'rms': rms,
-        'length_samples': len(audio_data)
+        'length_samples': n
     }
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""빠른 WAV 저장 유틸리티
+
+인코더 스택을 거치지 않고 16-bit PCM WAV를 메모리에서 조립해
+최소한의 시스템콜(헤더 1번 + 본문 1번)로 쓴다.
+"""
+import os
+import struct
+
+# 44바이트 RIFF/WAVE 헤더 템플릿 (PCM 16-bit)
+_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+
+def write_wav_fast(file_path, wav_tensor, sample_rate, mono=False):
+    """텐서를 int16 PCM WAV로 저장 (write 시스템콜 두 번)
+
+    스케일+캐스트는 벡터 연산 한 번, 본문은 tobytes()의 memcpy 한 번.
+    루드니스 정규화 없이 클램핑만 하므로 검수/디버깅용 파일에 적합하다.
+    mono=True면 채널 평균으로 다운믹스해 바이트 수를 더 줄인다.
+    """
+    wav = wav_tensor.detach().cpu()
+    if wav.dim() == 1:
+        wav = wav.unsqueeze(0)
+    if mono and wav.shape[0] > 1:
+        wav = wav.mean(dim=0, keepdim=True)
+    # (C, T) → 프레임 단위 인터리브된 int16 바이트열
+    pcm = wav.clamp(-1, 1).mul(32767).short().numpy().T.tobytes()
+    channels = wav.shape[0]
+    header = _HEADER.pack(
+        b'RIFF', 36 + len(pcm), b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate,
+        sample_rate * channels * 2, channels * 2, 16,
+        b'data', len(pcm))
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, header)
+        os.write(fd, pcm)
+    finally:
+        os.close(fd)